@@ -0,0 +1,101 @@
+"""Precomputed public display board per queue.
+
+The board lists today's in-room and waiting visits of one queue with the
+patient names already joined in. It is built from a single query and kept
+in the cache until a visit in that queue changes, so display screens can
+refresh with one cheap request.
+
+Boards are stored under a per-queue and day namespace version (see
+caching.py), which writes bump once they commit. A reader that built its
+board from rows read before the commit stores it under the old version,
+where no later reader looks, rather than over a key the writer already
+cleared. Estimated waits are added on each read from
+the queue's service-time model (see waittime.py), which changes on its own.
+"""
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caching import get_namespace_versions, invalidate_namespaces
+from .models import Visit
+from .waittime import estimate_wait, get_service_times
+
+BOARD_STATUSES = ("IN_ROOM", "WAITING")
+# Boards are keyed by day, so an entry only needs to outlive the clinic day.
+BOARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def board_namespace(queue_id, visit_date):
+    return f"queue-board:{queue_id}:{visit_date.isoformat()}"
+
+
+def board_cache_key(queue_id, visit_date):
+    namespace = board_namespace(queue_id, visit_date)
+    version = get_namespace_versions([namespace])[namespace]
+    return f"{namespace}:{version}"
+
+
+def build_queue_board(queue, visit_date):
+    """Return the board payload for ``queue`` on ``visit_date``."""
+    rows = (
+        Visit.objects.filter(queue=queue, visit_date=visit_date, status__in=BOARD_STATUSES)
+        .order_by("token_number")
+        .values("id", "token_number", "status", "patient_id", "patient__name")
+    )
+    board = {
+        "queue": {"id": queue.id, "name": queue.name},
+        "visit_date": visit_date.isoformat(),
+        "in_room": [],
+        "waiting": [],
+    }
+    for row in rows:
+        entries = board["in_room" if row["status"] == "IN_ROOM" else "waiting"]
+        entries.append(
+            {
+                "id": row["id"],
+                "token_number": row["token_number"],
+                "patient_registration_number": row["patient_id"],
+                "patient_full_name": row["patient__name"],
+                "position": len(entries) + 1,
+            }
+        )
+    return board
+
+
+def get_queue_board(queue):
+    """Return today's board for ``queue``, building and caching it on a miss.
+
+    Each waiting entry carries ``estimated_wait_seconds`` (``None`` until the
+    queue has a service-time model).
+    """
+    today = timezone.now().date()
+    key = board_cache_key(queue.id, today)
+    board = cache.get(key)
+    if board is None:
+        board = build_queue_board(queue, today)
+        cache.set(key, board, BOARD_CACHE_TIMEOUT)
+    service_seconds = get_service_times([queue.id]).get(queue.id)
+    board["service_time_seconds"] = None if service_seconds is None else round(service_seconds)
+    for entry in board["waiting"]:
+        entry["estimated_wait_seconds"] = estimate_wait(service_seconds, entry["position"])
+    return board
+
+
+def invalidate_queue_board(visit):
+    """Retire the cached board that shows ``visit`` once the write commits."""
+    invalidate_namespaces(board_namespace(visit.queue_id, visit.visit_date))
+
+
+def invalidate_patient_boards(patient):
+    """Retire today's cached boards that show ``patient`` once the write commits.
+
+    The affected queues are resolved immediately, so this also works before
+    a delete that cascades to the patient's visits.
+    """
+    today = timezone.now().date()
+    queue_ids = (
+        patient.visits.filter(visit_date=today).values_list("queue_id", flat=True).distinct()
+    )
+    namespaces = [board_namespace(queue_id, today) for queue_id in queue_ids]
+    if namespaces:
+        invalidate_namespaces(*namespaces)
@@ -0,0 +1,112 @@
+"""Namespaced, versioned response caching for read endpoints.
+
+Cached responses are stored under keys that embed the current version of
+each namespace they depend on. A write bumps the version of only the
+namespaces it affects, which orphans the stale entries (they age out on
+their timeout) and leaves every other cached response in place.
+
+Keys also embed the caller's permission scope (their role set), so a
+response is only reused for users holding exactly the same roles.
+Responses are marked private so shared proxies never store them.
+"""
+
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+# Version keys outlive the responses stored under them, then age out too.
+# A version that expires comes back newer, so it only costs a cache miss.
+NAMESPACE_VERSION_TIMEOUT = 2 * RESPONSE_CACHE_TIMEOUT
+
+
+def _version_key(namespace):
+    return f"cache-ns:{namespace}"
+
+
+def _fresh_version():
+    # Versions start from the clock rather than 1 so that a version key that
+    # was evicted cannot come back at a number older entries were stored under.
+    return time.time_ns()
+
+
+def get_namespace_versions(namespaces):
+    """Return the current version of each namespace, creating missing ones."""
+    keys = {namespace: _version_key(namespace) for namespace in namespaces}
+    stored = cache.get_many(keys.values())
+    versions = {}
+    for namespace, key in keys.items():
+        version = stored.get(key)
+        if version is None:
+            cache.add(key, _fresh_version(), timeout=NAMESPACE_VERSION_TIMEOUT)
+            version = cache.get(key)
+        versions[namespace] = version
+    return versions
+
+
+def bump_namespaces(*namespaces):
+    """Invalidate every response cached under any of ``namespaces``."""
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _fresh_version(), timeout=NAMESPACE_VERSION_TIMEOUT)
+
+
+def invalidate_namespaces(*namespaces):
+    """Bump ``namespaces`` once the surrounding transaction commits."""
+    transaction.on_commit(lambda: bump_namespaces(*namespaces))
+
+
+def permission_scope(request):
+    """Return the role set that decides what ``request.user`` may see."""
+    user = request.user
+    if not user.is_authenticated:
+        return "anonymous"
+    roles = {name.lower() for name in user.groups.values_list("name", flat=True)}
+    return ",".join(sorted(roles))
+
+
+def response_cache_key(request, namespaces):
+    versions = get_namespace_versions(namespaces)
+    fingerprint = "|".join(
+        [request.get_full_path(), f"scope={permission_scope(request)}"]
+        + [f"{name}={versions[name]}" for name in namespaces]
+    )
+    return f"response:{hashlib.md5(fingerprint.encode()).hexdigest()}"
+
+
+def cache_response(namespaces, timeout=RESPONSE_CACHE_TIMEOUT):
+    """Cache a viewset method's successful GET responses per permission scope.
+
+    ``namespaces`` is called with ``(view, request, kwargs)`` and returns
+    the namespaces the response depends on.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return method(view, request, *args, **kwargs)
+
+            key = response_cache_key(request, namespaces(view, request, kwargs))
+            cached = cache.get(key)
+            if cached is not None:
+                response = Response(cached)
+            else:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.data, timeout)
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
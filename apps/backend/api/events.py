@@ -0,0 +1,184 @@
+"""Live visit status events for queue displays.
+
+Visit writes publish a small JSON payload per change. Long-lived
+server-sent event (SSE) connections subscribe to the payloads for one queue,
+so displays are pushed updates instead of polling the visit list.
+
+On PostgreSQL, payloads travel through ``NOTIFY``/``LISTEN``. Every process
+serving the stream then sees changes made by any worker, and a notification
+is only delivered if its transaction commits. On other databases, payloads
+are delivered in-process after commit, which covers the development server
+and single-process deployments.
+
+The stream holds its connection open, so it must be served by the ASGI
+application (``clinicq_backend.asgi``).
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "clinicq_visit_events"
+# Comment frames sent on idle streams so proxies keep the connection open.
+KEEPALIVE_SECONDS = 15
+
+
+def visit_event_payload(visit):
+    """Return the JSON-serialisable payload published for ``visit``."""
+    return {
+        "id": visit.id,
+        "queue": visit.queue_id,
+        "token_number": visit.token_number,
+        "visit_date": str(visit.visit_date),
+        "status": visit.status,
+    }
+
+
+class VisitEventBroker:
+    """Fan published payloads out to subscribers of the matching queue.
+
+    Subscribers are asyncio queues owned by the event loop serving each
+    stream. ``publish`` may be called from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, queue_id):
+        """Register the running event loop for payloads of ``queue_id``."""
+        subscription = asyncio.Queue()
+        with self._lock:
+            self._subscribers[subscription] = (asyncio.get_running_loop(), int(queue_id))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.pop(subscription, None)
+
+    def publish(self, payload):
+        with self._lock:
+            targets = [
+                (loop, subscription)
+                for subscription, (loop, queue_id) in self._subscribers.items()
+                if queue_id == payload["queue"]
+            ]
+        for loop, subscription in targets:
+            try:
+                loop.call_soon_threadsafe(subscription.put_nowait, payload)
+            except RuntimeError:
+                # The stream's event loop has already shut down.
+                self.unsubscribe(subscription)
+
+
+broker = VisitEventBroker()
+
+
+class PostgresListener(threading.Thread):
+    """Relay ``NOTIFY`` payloads from PostgreSQL into the local broker."""
+
+    daemon = True
+    poll_interval = 5
+    reconnect_delay = 1
+
+    def __init__(self, alias="default"):
+        super().__init__(name="visit-event-listener")
+        self.alias = alias
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Visit event listener lost its connection; reconnecting")
+                time.sleep(self.reconnect_delay)
+
+    def _listen(self):
+        wrapper = connections[self.alias]
+        raw = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while True:
+                if select.select([raw], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    notification = raw.notifies.pop(0)
+                    broker.publish(json.loads(notification.payload))
+        finally:
+            raw.close()
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener():
+    """Start the PostgreSQL listener thread once per process."""
+    global _listener
+    if connection.vendor != "postgresql":
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = PostgresListener()
+            _listener.start()
+
+
+def publish_visit_change(*visits):
+    """Publish each of ``visits``' current status once the surrounding transaction commits.
+
+    On PostgreSQL all payloads are sent with a single query.
+    """
+    _publish([visit_event_payload(visit) for visit in visits])
+
+
+def publish_visit_removal(*visits):
+    """Publish that ``visits`` left their queue, by deletion or a move to another queue.
+
+    The payloads carry the queue and day the visits were in, plus
+    ``"removed": true``. Build them before the visits are deleted.
+    """
+    _publish([{**visit_event_payload(visit), "removed": True} for visit in visits])
+
+
+def _publish(payloads):
+    if not payloads:
+        return
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                [NOTIFY_CHANNEL, [json.dumps(payload) for payload in payloads]],
+            )
+    else:
+
+        def deliver():
+            for payload in payloads:
+                broker.publish(payload)
+
+        transaction.on_commit(deliver)
+
+
+async def stream_visit_events(queue_id):
+    """Yield server-sent event frames for visit changes in ``queue_id``."""
+    subscription = broker.subscribe(queue_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: visit\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,33 @@
+import logging
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.rollups import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily queue analytics rollups from visits and visit events"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            required=True,
+            help="First visit date to rebuild, as YYYY-MM-DD",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options["since"])
+        except ValueError:
+            raise CommandError("--since must be a YYYY-MM-DD date.")
+
+        logger.info(f"Rebuilding analytics rollups since {since}")
+        rows = rebuild_rollups(since)
+        logger.info(f"Rebuilt {rows} daily queue rollup rows since {since}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {rows} daily queue rollup rows since {since}")
+        )
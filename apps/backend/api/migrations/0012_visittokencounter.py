@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_token_counters(apps, schema_editor):
+    """Start each (queue, visit_date) counter at the highest token already issued."""
+    Visit = apps.get_model("api", "Visit")
+    VisitTokenCounter = apps.get_model("api", "VisitTokenCounter")
+    db_alias = schema_editor.connection.alias
+
+    rows = (
+        Visit.objects.using(db_alias)
+        .values("queue_id", "visit_date")
+        .annotate(last_token=Max("token_number"))
+        .order_by()
+    )
+    VisitTokenCounter.objects.using(db_alias).bulk_create(
+        [
+            VisitTokenCounter(
+                queue_id=row["queue_id"],
+                visit_date=row["visit_date"],
+                last_token=row["last_token"],
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_delete_registrationnumberformat_patient_category"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VisitTokenCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("visit_date", models.DateField()),
+                ("last_token", models.PositiveIntegerField(default=0)),
+                (
+                    "queue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="token_counters",
+                        to="api.queue",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("queue", "visit_date")},
+            },
+        ),
+        migrations.RunPython(seed_token_counters, migrations.RunPython.noop),
+    ]
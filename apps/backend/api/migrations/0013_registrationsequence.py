@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:53
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.db.models.functions import Substr
+
+
+def seed_registration_sequences(apps, schema_editor):
+    """Start each (mmyy, category) sequence at the highest serial already issued."""
+    Patient = apps.get_model("api", "Patient")
+    RegistrationSequence = apps.get_model("api", "RegistrationSequence")
+    db_alias = schema_editor.connection.alias
+
+    rows = (
+        Patient.objects.using(db_alias)
+        .filter(registration_number__regex=r"^\d{4}-\d{2}-\d{4}$")
+        .annotate(
+            period=Substr("registration_number", 1, 4),
+            prefix_category=Substr("registration_number", 6, 2),
+        )
+        .values("period", "prefix_category")
+        .annotate(last_number=Max("registration_number"))
+        .order_by()
+    )
+    RegistrationSequence.objects.using(db_alias).bulk_create(
+        [
+            RegistrationSequence(
+                period=row["period"],
+                category=row["prefix_category"],
+                last_serial=int(row["last_number"][-4:]),
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_visittokencounter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RegistrationSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("period", models.CharField(max_length=4)),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("01", "Self-paying"),
+                            ("02", "Insurance"),
+                            ("03", "Cash"),
+                            ("04", "Free"),
+                            ("05", "Poor"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("last_serial", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "unique_together": {("period", "category")},
+            },
+        ),
+        migrations.RunPython(seed_registration_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:12
+
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL: trigram GIN indexes on the expressions Django's icontains
+# lookup compares (UPPER(column::text) LIKE UPPER('%q%')).
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS api_patient_name_trgm "
+    "ON api_patient USING gin (UPPER(name::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS api_patient_phone_trgm "
+    "ON api_patient USING gin (UPPER(phone::text) gin_trgm_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS api_patient_phone_trgm",
+    "DROP INDEX IF EXISTS api_patient_name_trgm",
+]
+
+# SQLite: an FTS5 trigram shadow table kept in sync with api_patient by
+# triggers. Rows are located by matching their registration number, which
+# the trigram index serves, rather than by rowid, which VACUUM may renumber.
+SQLITE_DELETE_OLD = (
+    "DELETE FROM api_patient_search "
+    "WHERE api_patient_search MATCH 'registration_number : \"' "
+    "|| replace(old.registration_number, '\"', '\"\"') || '\"' "
+    "AND registration_number = old.registration_number;"
+)
+SQLITE_INSERT_NEW = (
+    "INSERT INTO api_patient_search (registration_number, name, phone) "
+    "VALUES (new.registration_number, new.name, COALESCE(new.phone, ''));"
+)
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS api_patient_search "
+    "USING fts5(registration_number, name, phone, tokenize='trigram')",
+    "DELETE FROM api_patient_search",
+    "INSERT INTO api_patient_search (registration_number, name, phone) "
+    "SELECT registration_number, name, COALESCE(phone, '') FROM api_patient",
+    "CREATE TRIGGER IF NOT EXISTS api_patient_search_insert AFTER INSERT ON api_patient "
+    f"BEGIN {SQLITE_INSERT_NEW} END",
+    "CREATE TRIGGER IF NOT EXISTS api_patient_search_delete AFTER DELETE ON api_patient "
+    f"BEGIN {SQLITE_DELETE_OLD} END",
+    "CREATE TRIGGER IF NOT EXISTS api_patient_search_update AFTER UPDATE ON api_patient "
+    f"BEGIN {SQLITE_DELETE_OLD} {SQLITE_INSERT_NEW} END",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS api_patient_search_update",
+    "DROP TRIGGER IF EXISTS api_patient_search_delete",
+    "DROP TRIGGER IF EXISTS api_patient_search_insert",
+    "DROP TABLE IF EXISTS api_patient_search",
+]
+
+
+def sqlite_supports_trigram_fts(connection):
+    """FTS5's trigram tokenizer needs SQLite 3.34+ built with FTS5."""
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram')")
+        except DatabaseError:
+            return False
+        cursor.execute("DROP TABLE temp.fts_probe")
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        try:
+            with transaction.atomic(using=connection.alias):
+                for statement in POSTGRES_FORWARD:
+                    schema_editor.execute(statement)
+        except DatabaseError:
+            logger.warning(
+                "Could not enable pg_trgm; patient search will run without a trigram index.",
+                exc_info=True,
+            )
+    elif connection.vendor == "sqlite" and sqlite_supports_trigram_fts(connection):
+        for statement in SQLITE_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        statements = POSTGRES_REVERSE
+    elif connection.vendor == "sqlite":
+        statements = SQLITE_REVERSE
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_registrationsequence"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:18
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_phone_digits(apps, schema_editor):
+    Patient = apps.get_model("api", "Patient")
+    db_alias = schema_editor.connection.alias
+
+    patients = []
+    for patient in Patient.objects.using(db_alias).exclude(phone__isnull=True).only("phone"):
+        digits = re.sub(r"\D", "", patient.phone)
+        if digits:
+            patient.phone_digits = digits
+            patient.phone_digits_reversed = digits[::-1]
+            patients.append(patient)
+    Patient.objects.using(db_alias).bulk_update(
+        patients, ["phone_digits", "phone_digits_reversed"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_patient_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="phone_digits",
+            field=models.CharField(editable=False, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="phone_digits_reversed",
+            field=models.CharField(db_index=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_phone_digits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:25
+
+from django.db import migrations, models
+
+from api.phonetics import phonetic_key
+
+
+def backfill_name_phonetic(apps, schema_editor):
+    Patient = apps.get_model("api", "Patient")
+    db_alias = schema_editor.connection.alias
+
+    patients = list(Patient.objects.using(db_alias).only("name"))
+    for patient in patients:
+        patient.name_phonetic = phonetic_key(patient.name)
+    Patient.objects.using(db_alias).bulk_update(patients, ["name_phonetic"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_patient_phone_digits"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="name_phonetic",
+            field=models.CharField(db_index=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(backfill_name_phonetic, migrations.RunPython.noop),
+    ]
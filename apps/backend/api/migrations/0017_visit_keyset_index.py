@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_patient_name_phonetic"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="visit",
+            index=models.Index(
+                fields=["visit_date", "queue", "token_number"], name="api_visit_keyset_idx"
+            ),
+        ),
+    ]
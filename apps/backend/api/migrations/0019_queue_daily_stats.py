@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_visitevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("visit_date", models.DateField()),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("01", "Self-paying"),
+                            ("02", "Insurance"),
+                            ("03", "Cash"),
+                            ("04", "Free"),
+                            ("05", "Poor"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                ("visits", models.PositiveIntegerField(default=0)),
+                (
+                    "queue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="category_stats",
+                        to="api.queue",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("queue", "visit_date", "category")},
+            },
+        ),
+        migrations.CreateModel(
+            name="QueueDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("visit_date", models.DateField()),
+                ("visits", models.PositiveIntegerField(default=0)),
+                ("done", models.PositiveIntegerField(default=0)),
+                ("wait_samples", models.PositiveIntegerField(default=0)),
+                ("wait_seconds", models.FloatField(default=0)),
+                ("service_samples", models.PositiveIntegerField(default=0)),
+                ("service_seconds", models.FloatField(default=0)),
+                (
+                    "queue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="api.queue",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("queue", "visit_date")},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:24
+
+from django.db import migrations, models
+
+# PostgreSQL: a partial index over the live queue (every status short of
+# DONE), which stays small however much history accumulates. psycopg2
+# inlines query parameters, so the planner sees the status literals and can
+# prove a status-filtered list falls inside the index condition. SQLite
+# never can with bound parameters, so it only gets api_visit_status_idx.
+POSTGRES_FORWARD = (
+    "CREATE INDEX IF NOT EXISTS api_visit_active_idx "
+    "ON api_visit (status, visit_date, queue_id, token_number) "
+    "WHERE status IN ('WAITING', 'START', 'IN_ROOM')"
+)
+POSTGRES_REVERSE = "DROP INDEX IF EXISTS api_visit_active_idx"
+
+
+def create_active_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(POSTGRES_FORWARD)
+
+
+def drop_active_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_queue_daily_stats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="visit",
+            index=models.Index(
+                fields=["status", "visit_date", "queue", "token_number"],
+                name="api_visit_status_idx",
+            ),
+        ),
+        migrations.RunPython(create_active_index, drop_active_index),
+    ]
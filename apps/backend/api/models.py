@@ -1,9 +1,14 @@
 # Reviewed for final cleanup
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Coalesce, Greatest
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 import datetime
 import re
 
+from .phonetics import phonetic_key
+
 
 def validate_registration_number_format(value):
     """Validate that registration number matches the format mmyy-ct-0000."""
@@ -15,6 +20,71 @@ def validate_registration_number_format(value):
         )
 
 
+def add_or_create(model, lookup, increments, initial=None):
+    """Add ``increments`` to the ``model`` row matching ``lookup``, creating it if missing.
+
+    Returns the row's new values of the incremented fields. The UPDATE runs
+    before anything is read, so on SQLite the transaction asks for the write
+    lock first and waits out the busy timeout, instead of taking a read lock
+    it then fails to upgrade ("database is locked"). Once the row exists,
+    this is one ``UPDATE ... RETURNING`` statement.
+    ``initial`` returns the values a new row starts from (zero by default).
+    """
+    with transaction.atomic(savepoint=False):
+        values = _increment(model, lookup, increments)
+        if values is not None:
+            return values
+        start = initial() if initial else {}
+        values = {field: start.get(field, 0) + value for field, value in increments.items()}
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookup, **values)
+        except IntegrityError:
+            # A concurrent transaction created the row first.
+            values = _increment(model, lookup, increments)
+        return values
+
+
+def _increment(model, lookup, increments):
+    """Add ``increments`` to the row matching ``lookup`` and return its new values.
+
+    Returns ``None`` when no row matches.
+    """
+    fields = list(increments)
+    if connection.vendor not in ("postgresql", "sqlite") or not (
+        connection.features.can_return_columns_from_insert
+    ):
+        rows = model.objects.filter(**lookup)
+        if not rows.update(**{field: F(field) + value for field, value in increments.items()}):
+            return None
+        return rows.values(*fields).get()
+
+    opts = model._meta
+    quote = connection.ops.quote_name
+    columns = [quote(opts.get_field(field).column) for field in fields]
+    conditions, params = [], list(increments.values())
+    for name, value in lookup.items():
+        field = opts.get_field(name)
+        conditions.append(f"{quote(field.column)} = %s")
+        value = value.pk if isinstance(value, models.Model) else value
+        params.append(field.get_db_prep_value(value, connection))
+    sql = (
+        f"UPDATE {quote(opts.db_table)} "
+        f"SET {', '.join(f'{column} = {column} + %s' for column in columns)} "
+        f"WHERE {' AND '.join(conditions)} RETURNING {', '.join(columns)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return None if row is None else dict(zip(fields, row))
+
+
+def normalize_phone_digits(phone):
+    """Return only the digits of ``phone``, or ``None`` when it has none."""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits or None
+
+
 class Visit(models.Model):
     PATIENT_GENDER_CHOICES = [
         ("MALE", "Male"),
@@ -56,11 +126,101 @@ class Visit(models.Model):
         # will be removed by makemigrations.
         unique_together = ("token_number", "visit_date", "queue")
         ordering = ["visit_date", "queue", "token_number"]
+        indexes = [
+            # Serves keyset pagination, which walks visits in this order, and
+            # any lookup of one day's visits, optionally narrowed to a queue.
+            models.Index(
+                fields=["visit_date", "queue", "token_number"], name="api_visit_keyset_idx"
+            ),
+            # Serves status-filtered lists (display and doctor screens). It
+            # is not partial: SQLite only uses a partial index when the query
+            # repeats its condition as literals, and Django binds statuses
+            # as parameters. On PostgreSQL, migration 0020 also adds
+            # api_visit_active_idx, the same columns over non-DONE visits.
+            models.Index(
+                fields=["status", "visit_date", "queue", "token_number"],
+                name="api_visit_status_idx",
+            ),
+        ]
 
     def __str__(self):
         """Readable representation shown in admin and logs."""
         return f"Token {self.token_number} - {self.patient.name} ({self.visit_date})"
 
+    @classmethod
+    def claim_next(cls, queue, visit_date):
+        """Move the lowest-token waiting visit of ``queue`` to START and return it.
+
+        Returns ``None`` when nobody is waiting. Where the database supports
+        ``SKIP LOCKED``, concurrent callers lock different rows and never
+        wait on each other.
+        """
+        waiting = (
+            cls.objects.select_related("patient", "queue")
+            .filter(queue=queue, visit_date=visit_date, status="WAITING")
+            .order_by("token_number")
+        )
+        with transaction.atomic():
+            if connection.features.has_select_for_update_skip_locked:
+                visit = waiting.select_for_update(skip_locked=True, of=("self",)).first()
+            else:
+                # No SKIP LOCKED (SQLite): touch the queue's token counter
+                # first. That write takes the database lock, so claims run one
+                # at a time and the read below cannot go stale.
+                VisitTokenCounter.objects.filter(queue=queue, visit_date=visit_date).update(
+                    last_token=F("last_token")
+                )
+                visit = waiting.first()
+            if visit is None:
+                return None
+            visit.status = "START"
+            visit.save(update_fields=["status", "updated_at"])
+            VisitEvent.record(visit)
+            QueueDailyStats.record_transition("START", visit)
+        return visit
+
+    @classmethod
+    def move_status(cls, queryset, new_status, from_statuses):
+        """Move the visits of ``queryset`` still in ``from_statuses`` to ``new_status``.
+
+        Returns the ids of the visits that moved. As in ``add_or_create``, the
+        UPDATE runs before anything is read, so concurrent calls on SQLite
+        queue for the write lock instead of deadlocking on read locks. The
+        status condition is repeated on the updated row itself, which
+        PostgreSQL re-checks after waiting for a concurrent writer.
+        """
+        now = timezone.now()
+        rows = queryset.filter(status__in=from_statuses)
+        if connection.vendor not in ("postgresql", "sqlite") or not (
+            connection.features.can_return_columns_from_insert
+        ):
+            with transaction.atomic(savepoint=False):
+                ids = list(rows.select_for_update().values_list("pk", flat=True))
+                cls.objects.filter(pk__in=ids).update(status=new_status, updated_at=now)
+            return ids
+
+        opts = cls._meta
+        quote = connection.ops.quote_name
+        pk_column = quote(opts.pk.column)
+        status_column = quote(opts.get_field("status").column)
+        subquery, subquery_params = rows.values("pk").query.sql_with_params()
+        placeholders = ", ".join(["%s"] * len(from_statuses))
+        sql = (
+            f"UPDATE {quote(opts.db_table)} "
+            f"SET {status_column} = %s, {quote(opts.get_field('updated_at').column)} = %s "
+            f"WHERE {pk_column} IN ({subquery}) AND {status_column} IN ({placeholders}) "
+            f"RETURNING {pk_column}"
+        )
+        params = [
+            new_status,
+            opts.get_field("updated_at").get_db_prep_value(now, connection),
+            *subquery_params,
+            *from_statuses,
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [pk for (pk,) in cursor.fetchall()]
+
 
 class Patient(models.Model):
     CATEGORY_CHOICES = [
@@ -79,11 +239,21 @@ class Patient(models.Model):
         validators=[validate_registration_number_format],
     )
     name = models.CharField(max_length=255)
+    # Maintained by save(): the phonetic key of ``name`` (see phonetics.py),
+    # so spelling variants of a name match through an index.
+    name_phonetic = models.CharField(max_length=255, null=True, editable=False, db_index=True)
     phone = models.CharField(
         max_length=20,
         blank=True,
         null=True,
     )  # Assuming phone is optional
+    # Maintained by save(): the digits of ``phone`` and the same digits
+    # reversed. Indexing the reversed digits turns "phone ends with" into an
+    # indexed prefix range scan.
+    phone_digits = models.CharField(max_length=20, null=True, editable=False)
+    phone_digits_reversed = models.CharField(
+        max_length=20, null=True, editable=False, db_index=True
+    )
     gender = models.CharField(
         max_length=10,
         choices=Visit.PATIENT_GENDER_CHOICES,  # Reusing choices from Visit
@@ -97,6 +267,11 @@ class Patient(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # How many times save() moves on to the next serial when the allocated
+    # registration number is already taken by a row that predates the
+    # registration sequence.
+    REGISTRATION_RETRY_LIMIT = 5
+
     @classmethod
     def generate_next_registration_number(cls, category):
         """Generate the next registration number in format mmyy-ct-0000.
@@ -110,20 +285,7 @@ class Patient(models.Model):
         now = datetime.datetime.now()
         mmyy = f"{now.month:02d}{now.year % 100:02d}"
 
-        # Find the last patient with the same mmyy-ct prefix
-        prefix = f"{mmyy}-{category}-"
-        last_patient = (
-            cls.objects.filter(registration_number__startswith=prefix)
-            .order_by("-registration_number")
-            .first()
-        )
-
-        if last_patient:
-            # Extract the serial number from the last registration
-            serial_str = last_patient.registration_number.split("-")[-1]
-            next_serial = int(serial_str) + 1
-        else:
-            next_serial = 1
+        next_serial = RegistrationSequence.next_serial(mmyy, category)
 
         if next_serial > 9999:
             raise ValidationError(
@@ -134,14 +296,43 @@ class Patient(models.Model):
         return f"{mmyy}-{category}-{next_serial:04d}"
 
     def save(self, *args, **kwargs):
-        from django.db import transaction
+        self.name_phonetic = phonetic_key(self.name)
+        self.phone_digits = normalize_phone_digits(self.phone)
+        self.phone_digits_reversed = self.phone_digits[::-1] if self.phone_digits else None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "name" in update_fields:
+                update_fields.add("name_phonetic")
+            if "phone" in update_fields:
+                update_fields |= {"phone_digits", "phone_digits_reversed"}
+            kwargs["update_fields"] = update_fields
 
-        # Auto-generate registration number if not provided
-        if not self.registration_number:
-            # Use transaction to ensure atomicity when generating registration number
-            with transaction.atomic():
+        if self.registration_number:
+            super().save(*args, **kwargs)
+            return
+
+        # Auto-generate registration number. The serial is allocated from the
+        # registration sequence and the row is force-inserted in the same
+        # transaction, so a number that is already taken raises instead of
+        # silently overwriting the existing patient.
+        kwargs["force_insert"] = True
+        with transaction.atomic():
+            for attempt in range(self.REGISTRATION_RETRY_LIMIT):
                 self.registration_number = self.generate_next_registration_number(self.category)
-        super().save(*args, **kwargs)
+                try:
+                    with transaction.atomic():
+                        super().save(*args, **kwargs)
+                    return
+                except IntegrityError:
+                    taken = (
+                        type(self)
+                        .objects.filter(registration_number=self.registration_number)
+                        .exists()
+                    )
+                    if not taken or attempt == self.REGISTRATION_RETRY_LIMIT - 1:
+                        self.registration_number = ""
+                        raise
 
     def __str__(self):
         return f"{self.name} (ID: {self.registration_number})"
@@ -165,6 +356,94 @@ class Queue(models.Model):
         return self.name
 
 
+class RegistrationSequence(models.Model):
+    """Last registration serial issued for a month (mmyy) and category.
+
+    Registration numbers are allocated by incrementing this row rather than
+    scanning patients for the highest matching prefix, which keeps
+    registration constant-time and serialises concurrent registrations.
+    """
+
+    period = models.CharField(max_length=4)
+    category = models.CharField(max_length=2, choices=Patient.CATEGORY_CHOICES)
+    last_serial = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("period", "category")
+
+    def __str__(self):
+        return f"{self.period}-{self.category}: {self.last_serial}"
+
+    @classmethod
+    def next_serial(cls, period, category):
+        """Atomically allocate the next serial for ``period`` and ``category``.
+
+        The sequence row is created on first use and seeded from the highest
+        serial already stored under the same prefix.
+        """
+        values = add_or_create(
+            cls,
+            {"period": period, "category": category},
+            {"last_serial": 1},
+            initial=lambda: {"last_serial": cls._last_stored_serial(period, category)},
+        )
+        return values["last_serial"]
+
+    @staticmethod
+    def _last_stored_serial(period, category):
+        last_number = (
+            Patient.objects.filter(registration_number__startswith=f"{period}-{category}-")
+            .order_by("-registration_number")
+            .values_list("registration_number", flat=True)
+            .first()
+        )
+        if last_number is None:
+            return 0
+        return int(last_number.split("-")[-1])
+
+
+class VisitTokenCounter(models.Model):
+    """Last token handed out for a queue on a given day.
+
+    Token allocation increments a single counter row instead of scanning the
+    day's visits, so it stays constant-time and serialises concurrent
+    assistants on one row lock (or the database write lock on SQLite).
+    """
+
+    queue = models.ForeignKey(
+        Queue,
+        on_delete=models.CASCADE,
+        related_name="token_counters",
+    )
+    visit_date = models.DateField()
+    last_token = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("queue", "visit_date")
+
+    def __str__(self):
+        return f"{self.queue_id} @ {self.visit_date}: {self.last_token}"
+
+    @classmethod
+    def next_token(cls, queue, visit_date):
+        """Atomically allocate the next token number for ``queue`` on ``visit_date``.
+
+        The counter row is created on first use and seeded from any visits
+        already stored for that day, so tokens keep counting up from rows
+        written before the counter existed.
+        """
+        lookup = {"queue": queue, "visit_date": visit_date}
+        values = add_or_create(
+            cls,
+            lookup,
+            {"last_token": 1},
+            initial=lambda: Visit.objects.filter(**lookup).aggregate(
+                last_token=Coalesce(Max("token_number"), 0)
+            ),
+        )
+        return values["last_token"]
+
+
 class PrescriptionImage(models.Model):
     """Stores a reference to a prescription image for a visit."""
 
@@ -175,3 +454,222 @@ class PrescriptionImage(models.Model):
 
     def __str__(self):
         return f"Prescription for visit {self.visit_id}"
+
+
+class VisitEvent(models.Model):
+    """Append-only log entry: ``visit`` entered ``status`` at ``timestamp``.
+
+    One row is written in the same transaction as each visit creation and
+    status change. The previous entry for the same visit tells which status
+    it left, so the log stays compact. Rows are indexed by queue, day and
+    time, so analytics and audits read a day of a queue as a range scan.
+
+    Deleting a visit keeps its events, with ``visit_id`` still set, so the
+    audit trail and rebuilt rollups outlive it.
+    """
+
+    visit = models.ForeignKey(
+        Visit, on_delete=models.DO_NOTHING, db_constraint=False, related_name="events"
+    )
+    # Queue lookups are served by the range index below.
+    queue = models.ForeignKey(
+        Queue, on_delete=models.CASCADE, related_name="visit_events", db_index=False
+    )
+    visit_date = models.DateField()
+    status = models.CharField(max_length=10, choices=Visit.STATUS_CHOICES)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["queue", "visit_date", "timestamp"], name="api_visitevent_range_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Visit {self.visit_id} -> {self.status} at {self.timestamp}"
+
+    @classmethod
+    def for_visit(cls, visit):
+        """Return an unsaved event recording ``visit``'s current status."""
+        return cls(
+            visit=visit,
+            queue_id=visit.queue_id,
+            visit_date=visit.visit_date,
+            status=visit.status,
+            timestamp=visit.updated_at,
+        )
+
+    @classmethod
+    def record(cls, *visits):
+        """Append an event for the current status of each of ``visits``."""
+        cls.objects.bulk_create([cls.for_visit(visit) for visit in visits])
+
+    @classmethod
+    def last_entered(cls, visits, status):
+        """Return ``{visit_id: timestamp}`` of when each visit last entered ``status``.
+
+        Visits that never entered it since the log began are left out.
+        """
+        return dict(
+            cls.objects.filter(visit__in=[visit.pk for visit in visits], status=status)
+            .values("visit_id")
+            .annotate(last=Max("timestamp"))
+            .values_list("visit_id", "last")
+        )
+
+
+class QueueDailyStats(models.Model):
+    """Visit totals for one queue and day, kept current on each visit write.
+
+    Rows are updated in the same transaction as visit creation, status
+    changes, edits and deletes made through the API, so dashboards read one
+    row per queue and day instead of scanning visits. ``rebuild_rollups`` recomputes them from
+    ``Visit`` and ``VisitEvent`` after writes that bypass the API.
+
+    Waits run from a visit entering WAITING to it moving to START; service
+    times from entering IN_ROOM to moving to DONE. Each is stored as a sum
+    and a sample count so averages can be combined across days.
+    """
+
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE, related_name="daily_stats")
+    visit_date = models.DateField()
+    visits = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    wait_samples = models.PositiveIntegerField(default=0)
+    wait_seconds = models.FloatField(default=0)
+    service_samples = models.PositiveIntegerField(default=0)
+    service_seconds = models.FloatField(default=0)
+
+    # Status a visit must have come from for a move to the key status to be
+    # timed, and the sum and count fields the time is added to.
+    TIMED_TRANSITIONS = {
+        "START": ("WAITING", "wait_seconds", "wait_samples"),
+        "DONE": ("IN_ROOM", "service_seconds", "service_samples"),
+    }
+
+    class Meta:
+        unique_together = ("queue", "visit_date")
+
+    def __str__(self):
+        return f"{self.queue_id} @ {self.visit_date}: {self.visits} visits"
+
+    @classmethod
+    def add(cls, queue_id, visit_date, **increments):
+        """Atomically add ``increments`` to the row for ``queue_id`` on ``visit_date``."""
+        add_or_create(cls, {"queue_id": queue_id, "visit_date": visit_date}, increments)
+
+    @classmethod
+    def remove(cls, queue_id, visit_date, **decrements):
+        """Subtract ``decrements`` from the row for ``queue_id`` on ``visit_date``.
+
+        Counts stop at zero: rows written before the rollups existed may
+        undercount until ``rebuild_rollups`` runs. A missing row is left
+        missing.
+        """
+        cls.objects.filter(queue_id=queue_id, visit_date=visit_date).update(
+            **{field: Greatest(F(field) - value, 0) for field, value in decrements.items()}
+        )
+
+    @classmethod
+    def record_created(cls, visit):
+        """Count a newly created ``visit`` and its patient's category."""
+        with transaction.atomic(savepoint=False):
+            cls.add(visit.queue_id, visit.visit_date, visits=1)
+            CategoryDailyStats.add(visit.queue_id, visit.visit_date, visit.patient.category)
+
+    @classmethod
+    def record_deleted(cls, visit):
+        """Stop counting a ``visit`` that is being deleted.
+
+        Its waits and service times stay counted, as ``rebuild_rollups``
+        would leave them: they come from its events, which outlive it.
+        """
+        with transaction.atomic(savepoint=False):
+            cls.remove(visit.queue_id, visit.visit_date, **cls._counts(visit))
+            CategoryDailyStats.remove(visit.queue_id, visit.visit_date, visit.patient.category)
+
+    @classmethod
+    def record_moved(cls, previous, visit):
+        """Move ``visit``'s counts over from ``previous``, its state before an edit.
+
+        An edit may change the queue or the patient, and with the patient
+        the category. Waits and service times stay with the queue they were
+        spent in.
+        """
+        old_day = (previous.queue_id, previous.visit_date)
+        new_day = (visit.queue_id, visit.visit_date)
+        old_category = previous.patient.category
+        new_category = visit.patient.category
+        with transaction.atomic(savepoint=False):
+            if old_day != new_day:
+                cls.remove(*old_day, **cls._counts(previous))
+                cls.add(*new_day, **cls._counts(visit))
+            if (*old_day, old_category) != (*new_day, new_category):
+                CategoryDailyStats.remove(*old_day, old_category)
+                CategoryDailyStats.add(*new_day, new_category)
+
+    @staticmethod
+    def _counts(visit):
+        return {"visits": 1, "done": 1} if visit.status == "DONE" else {"visits": 1}
+
+    @classmethod
+    def record_transition(cls, new_status, *visits):
+        """Account for ``visits`` having just moved to ``new_status``.
+
+        For timed transitions, returns ``VisitEvent.last_entered`` for the
+        status the visits left, so callers timing the same move reuse it.
+        Otherwise returns ``{}``.
+        """
+        if new_status not in cls.TIMED_TRANSITIONS:
+            return {}
+        previous, seconds_field, samples_field = cls.TIMED_TRANSITIONS[new_status]
+        entered = VisitEvent.last_entered(visits, previous)
+        totals = {}
+        for visit in visits:
+            increments = totals.setdefault(
+                (visit.queue_id, visit.visit_date), {seconds_field: 0, samples_field: 0}
+            )
+            if new_status == "DONE":
+                increments["done"] = increments.get("done", 0) + 1
+            if visit.pk in entered:
+                increments[seconds_field] += (visit.updated_at - entered[visit.pk]).total_seconds()
+                increments[samples_field] += 1
+        with transaction.atomic(savepoint=False):
+            for (queue_id, visit_date), increments in totals.items():
+                cls.add(queue_id, visit_date, **increments)
+        return entered
+
+
+class CategoryDailyStats(models.Model):
+    """Visits per patient category for one queue and day.
+
+    Maintained alongside ``QueueDailyStats``; the category is the patient's
+    category when the visit was created or moved to that patient.
+    """
+
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE, related_name="category_stats")
+    visit_date = models.DateField()
+    category = models.CharField(max_length=2, choices=Patient.CATEGORY_CHOICES)
+    visits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("queue", "visit_date", "category")
+
+    def __str__(self):
+        return f"{self.queue_id} @ {self.visit_date} [{self.category}]: {self.visits}"
+
+    @classmethod
+    def add(cls, queue_id, visit_date, category, visits=1):
+        add_or_create(
+            cls,
+            {"queue_id": queue_id, "visit_date": visit_date, "category": category},
+            {"visits": visits},
+        )
+
+    @classmethod
+    def remove(cls, queue_id, visit_date, category, visits=1):
+        """Subtract ``visits``, stopping at zero, as ``QueueDailyStats.remove`` does."""
+        cls.objects.filter(queue_id=queue_id, visit_date=visit_date, category=category).update(
+            visits=Greatest(F("visits") - visits, 0)
+        )
@@ -1,4 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -7,3 +16,129 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only cursor pagination over a unique, ascending key.
+
+    Each page continues strictly after the key of the previous page's last
+    row, so no ``COUNT(*)`` or ``OFFSET`` is run and a deep page costs the
+    same as the first. Subclasses set ``keyset`` to field names that are
+    unique together and not nullable.
+    """
+
+    keyset = ()
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_param = StandardResultsSetPagination.page_size_query_param
+    max_page_size = StandardResultsSetPagination.max_page_size
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def encode_cursor(self, instance):
+        values = [getattr(instance, field) for field in self.keyset]
+        raw = json.dumps(values, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keyset):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def after(self, values):
+        """Return a filter for the rows whose key sorts after ``values``.
+
+        ``(a, b, c) > (x, y, z)`` is written out as
+        ``a >= x AND (a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z))``.
+        The redundant ``a >= x`` bounds the leading column on its own, so
+        the database can start an index range there instead of scanning.
+        """
+        condition = Q()
+        for position, field in enumerate(self.keyset):
+            equal = {name: value for name, value in zip(self.keyset[:position], values)}
+            condition |= Q(**equal, **{f"{field}__gt": values[position]})
+        if len(self.keyset) > 1:
+            condition &= Q(**{f"{self.keyset[0]}__gte": values[0]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.keyset)
+        values = self.decode_cursor(request)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.after(values))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[: page_size + 1])
+        page = rows[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if len(rows) > page_size else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class PatientKeysetPagination(KeysetPagination):
+    keyset = ("registration_number",)
+
+
+class VisitKeysetPagination(KeysetPagination):
+    keyset = ("visit_date", "queue_id", "token_number")
+
+
+class KeysetPaginationMixin:
+    """Serve ``list`` with ``keyset_pagination_class`` when ``?cursor`` is given.
+
+    ``?cursor=`` (empty) requests the first page; every page links to the
+    next one. Requests without the parameter keep page-number pagination.
+    """
+
+    keyset_pagination_class = None
+
+    def uses_keyset_pagination(self):
+        return (
+            self.keyset_pagination_class is not None
+            and self.action == "list"
+            and KeysetPagination.cursor_query_param in self.request.query_params
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.uses_keyset_pagination():
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
@@ -0,0 +1,68 @@
+"""Phonetic keys for matching transliterated patient names.
+
+Romanised names are spelled many ways ("Muhammad", "Mohammad", "Mohd";
+"Ayesha", "Aisha"). ``phonetic_key`` reduces each word of a name to a
+consonant skeleton in the spirit of Metaphone, tuned for the spellings
+seen at the clinic:
+
+- common abbreviations are expanded ("Mohd" -> "muhammad");
+- digraphs and letters that sound alike are merged ("kh" -> "k", "q" -> "k",
+  "sh"/"ch" -> "x", "ph" -> "f", "w" -> "v");
+- a leading vowel becomes "a" and all other vowels are dropped;
+- a trailing "h" is dropped and repeated letters are collapsed.
+
+The key of a whole name is the keys of its words joined by spaces. It is
+stored on ``Patient.name_phonetic`` so variants match through an index.
+"""
+
+import re
+
+# Abbreviations written in place of a full name.
+ABBREVIATIONS = {
+    "md": "muhammad",
+    "mohd": "muhammad",
+    "muhd": "muhammad",
+}
+
+# Applied in order, so "x" is expanded before "sh"/"ch" are written as "x".
+SUBSTITUTIONS = (
+    ("x", "ks"),
+    ("sh", "x"),
+    ("ch", "x"),
+    ("ph", "f"),
+    ("kh", "k"),
+    ("gh", "g"),
+    ("th", "t"),
+    ("dh", "d"),
+    ("bh", "b"),
+    ("ck", "k"),
+    ("q", "k"),
+    ("c", "k"),
+    ("w", "v"),
+)
+
+VOWELS = frozenset("aeiouy")
+
+MAX_KEY_LENGTH = 255
+
+
+def word_key(word):
+    """Return the phonetic key of a single lowercase ``word``."""
+    word = ABBREVIATIONS.get(word, word)
+    for spelling, sound in SUBSTITUTIONS:
+        word = word.replace(spelling, sound)
+
+    first, rest = word[0], word[1:]
+    if first in VOWELS and first != "y":
+        first = "a"
+    skeleton = first + "".join(char for char in rest if char not in VOWELS)
+    if len(skeleton) > 1:
+        skeleton = skeleton.rstrip("h")
+    return re.sub(r"(.)\1+", r"\1", skeleton)
+
+
+def phonetic_key(name):
+    """Return the phonetic key of ``name``, or ``None`` when it has no letters."""
+    words = re.findall(r"[a-z]+", (name or "").lower())
+    key = " ".join(word_key(word) for word in words)
+    return key[:MAX_KEY_LENGTH] or None
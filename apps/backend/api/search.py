@@ -0,0 +1,202 @@
+"""Indexed patient search helpers.
+
+Substring matches on patient names and phone numbers are served by a
+trigram index instead of a full table scan:
+
+- PostgreSQL: ``pg_trgm`` GIN indexes on ``UPPER(name)`` and ``UPPER(phone)``
+  serve Django's ``icontains`` lookups unchanged.
+- SQLite: the ``api_patient_search`` FTS5 trigram table, kept in sync with
+  ``api_patient`` by triggers, is queried with ``MATCH``.
+
+Both indexes are created by migration ``0014_patient_search_index``. Where
+they are unavailable, searches fall back to ``icontains``.
+
+Phone-number endings are matched on the normalized digits instead, as a
+prefix range scan over the indexed ``phone_digits_reversed`` column, so
+formatting such as spaces, dashes or a ``+92`` prefix does not matter.
+
+Spelling variants of a name ("Mohammad", "Muhammad", "Mohd") are matched
+through the indexed ``name_phonetic`` column.
+
+Autocomplete suggestions are built from the same indexes, one bounded
+query per kind of match. Full search results are ranked by relevance in
+the database, so the best match is on the first page.
+"""
+
+import re
+import sqlite3
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Visit, normalize_phone_digits
+from .phonetics import phonetic_key
+
+SEARCH_TABLE = "api_patient_search"
+# Trigram indexes cannot serve substrings shorter than one trigram.
+TRIGRAM_MIN_LENGTH = 3
+# Shorter digit runs match too many phone numbers to be worth a suffix search.
+PHONE_SUFFIX_MIN_DIGITS = 4
+PHONE_QUERY_PATTERN = re.compile(r"^\+?[\d\s().-]+$")
+REGISTRATION_PREFIX_PATTERN = re.compile(r"^\d[\d-]*$")
+AUTOCOMPLETE_FIELDS = ("registration_number", "name", "phone", "gender")
+
+
+@lru_cache(maxsize=None)
+def sqlite_supports_trigram_fts():
+    """Whether the linked SQLite library has FTS5 with the trigram tokenizer.
+
+    Migration 0014 creates the search table exactly when this holds, so the
+    check needs no query against the application database.
+    """
+    probe = sqlite3.connect(":memory:")
+    try:
+        probe.execute("CREATE VIRTUAL TABLE fts_probe USING fts5(x, tokenize='trigram')")
+    except sqlite3.Error:
+        return False
+    finally:
+        probe.close()
+    return True
+
+
+def fts_phrase(text):
+    """Quote ``text`` as a single FTS5 phrase."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _uses_search_table(query):
+    return (
+        connection.vendor == "sqlite"
+        and len(query) >= TRIGRAM_MIN_LENGTH
+        and sqlite_supports_trigram_fts()
+    )
+
+
+def _search_table_match(columns, query):
+    """Return a filter on the patients whose ``columns`` contain ``query``."""
+    return Q(
+        registration_number__in=RawSQL(
+            f"SELECT registration_number FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+            [f"{{{columns}}} : {fts_phrase(query)}"],
+        )
+    )
+
+
+def name_or_phone_contains(query):
+    """Return a filter matching patients whose name or phone contains ``query``."""
+    if _uses_search_table(query):
+        return _search_table_match("name phone", query)
+    return Q(name__icontains=query) | Q(phone__icontains=query)
+
+
+def name_starts_with(query):
+    """Return a filter matching patients whose name starts with ``query``.
+
+    On PostgreSQL the trigram index serves ``istartswith`` directly; on
+    SQLite the search table narrows the candidates first.
+    """
+    filters = Q(name__istartswith=query)
+    if _uses_search_table(query):
+        filters &= _search_table_match("name", query)
+    return filters
+
+
+def registration_number_starts_with(query):
+    """Return a filter matching registration numbers that start with ``query``.
+
+    Written as a range on the primary key rather than ``startswith``, which
+    SQLite cannot serve from an index because its ``LIKE`` ignores case.
+    """
+    upper_bound = query[:-1] + chr(ord(query[-1]) + 1)
+    return Q(registration_number__gte=query, registration_number__lt=upper_bound)
+
+
+def phone_ends_with(query):
+    """Return a filter matching phones whose digits end with those of ``query``.
+
+    Returns ``None`` when ``query`` does not look like part of a phone number.
+    """
+    if not PHONE_QUERY_PATTERN.match(query):
+        return None
+    digits = normalize_phone_digits(query)
+    if digits is None or len(digits) < PHONE_SUFFIX_MIN_DIGITS:
+        return None
+    prefix = digits[::-1]
+    # Every stored value starting with ``prefix`` sorts between ``prefix``
+    # and ``prefix`` followed by ":", the character after "9".
+    return Q(phone_digits_reversed__gte=prefix, phone_digits_reversed__lt=prefix + ":")
+
+
+def name_sounds_like(query):
+    """Return a filter matching names that start with words sounding like ``query``.
+
+    Returns ``None`` when ``query`` has no letters.
+    """
+    key = phonetic_key(query)
+    if key is None:
+        return None
+    # Whole-key equality, or a range over keys continuing with another word:
+    # " " sorts directly before "!".
+    return Q(name_phonetic=key) | Q(name_phonetic__gte=key + " ", name_phonetic__lt=key + "!")
+
+
+def order_by_relevance(queryset, query):
+    """Order patients matched by ``query`` from the most to the least relevant.
+
+    Exact registration number first, then exact phone, then name prefix,
+    then name substring, then any other match. Ties go to the patient seen
+    most recently, then to the registration number.
+    """
+    exact_phone = Q(phone=query)
+    digits = normalize_phone_digits(query) if PHONE_QUERY_PATTERN.match(query) else None
+    if digits is not None:
+        exact_phone |= Q(phone_digits=digits)
+    last_visit = (
+        Visit.objects.filter(patient=OuterRef("pk")).order_by("-visit_date").values("visit_date")
+    )
+    return queryset.alias(
+        relevance=Case(
+            When(registration_number=query, then=Value(0)),
+            When(exact_phone, then=Value(1)),
+            When(name__istartswith=query, then=Value(2)),
+            When(name__icontains=query, then=Value(3)),
+            default=Value(4),
+            output_field=IntegerField(),
+        ),
+        last_visit_date=Subquery(last_visit[:1]),
+    ).order_by("relevance", F("last_visit_date").desc(nulls_last=True), "registration_number")
+
+
+def autocomplete_patients(queryset, query, limit):
+    """Return up to ``limit`` minimal patient rows matching the start of ``query``.
+
+    Registration number prefixes rank first, then phone-number endings, then
+    name prefixes. Each kind is one bounded, indexed query, run only while
+    fewer than ``limit`` rows have been found, and no count is taken.
+    """
+    candidates = []
+    if REGISTRATION_PREFIX_PATTERN.match(query):
+        candidates.append((registration_number_starts_with(query), "registration_number"))
+    phone_suffix = phone_ends_with(query)
+    if phone_suffix is not None:
+        candidates.append((phone_suffix, "phone_digits_reversed"))
+    if any(char.isalpha() for char in query):
+        candidates.append((name_starts_with(query), "name"))
+
+    rows = []
+    for filters, ordering in candidates:
+        matches = queryset.filter(filters)
+        if rows:
+            matches = matches.exclude(
+                registration_number__in=[row["registration_number"] for row in rows]
+            )
+        rows.extend(
+            matches.order_by(ordering, "registration_number").values(*AUTOCOMPLETE_FIELDS)[
+                : limit - len(rows)
+            ]
+        )
+        if len(rows) >= limit:
+            break
+    return rows
@@ -1,3 +1,5 @@
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from rest_framework import serializers
 from .models import (
     Visit,
@@ -5,6 +7,24 @@ from .models import (
     Queue,
     PrescriptionImage,
 )
+from .waittime import waiting_estimates
+
+
+def recent_visits_prefetch(lookup="visits"):
+    """Prefetch each patient's five latest visits into ``recent_visits``.
+
+    The visits are ranked per patient with a window function, so the dates
+    for a whole page of patients come from one query. ``lookup`` is the path
+    to the patients' visits, e.g. ``"patient__visits"`` from a Visit queryset.
+    """
+    ranked = Visit.objects.annotate(
+        recency=Window(
+            RowNumber(),
+            partition_by=F("patient_id"),
+            order_by=(F("visit_date").desc(), F("id").desc()),
+        )
+    ).filter(recency__lte=5)
+    return Prefetch(lookup, queryset=ranked.order_by("-visit_date", "-id"), to_attr="recent_visits")
 
 
 class PatientSerializer(serializers.ModelSerializer):
@@ -25,6 +45,9 @@ class PatientSerializer(serializers.ModelSerializer):
         read_only_fields = ["registration_number", "created_at", "updated_at"]
 
     def get_last_5_visit_dates(self, obj):
+        recent_visits = getattr(obj, "recent_visits", None)
+        if recent_visits is not None:
+            return [visit.visit_date for visit in recent_visits]
         return obj.visits.order_by("-visit_date").values_list("visit_date", flat=True)[:5]
 
 
@@ -49,6 +72,9 @@ class VisitSerializer(serializers.ModelSerializer):
         source="queue.name",
         read_only=True,
     )
+    # Seconds until a WAITING visit is likely called (see waittime.py);
+    # null for other statuses or before the queue has a service-time model.
+    estimated_wait_seconds = serializers.SerializerMethodField()
 
     # Writeable fields for linking to Patient and Queue
     # The client will send 'patient' (registration_number) and 'queue' (id).
@@ -75,6 +101,7 @@ class VisitSerializer(serializers.ModelSerializer):
             "patient_registration_number",  # read-only representation
             "patient_full_name",  # read-only representation
             "queue_name",  # read-only representation
+            "estimated_wait_seconds",
         ]
         read_only_fields = [
             "token_number",
@@ -87,6 +114,28 @@ class VisitSerializer(serializers.ModelSerializer):
             "queue_name",
         ]
 
+    def get_estimated_wait_seconds(self, obj):
+        if obj.status != "WAITING":
+            return None
+        # Estimates are computed once per queue and day for the whole response.
+        estimates = self.context.setdefault("wait_estimates", {})
+        key = (obj.queue_id, obj.visit_date)
+        if key not in estimates:
+            estimates[key] = waiting_estimates(*key)
+        return estimates[key].get(obj.pk)
+
+    def to_representation(self, instance):
+        """Add related data requested through the ``expand`` context entry."""
+        data = super().to_representation(instance)
+        expand = self.context.get("expand", ())
+        if "patient" in expand:
+            data["patient_details"] = PatientSerializer(instance.patient, context=self.context).data
+        if "prescriptions" in expand:
+            data["prescription_images"] = PrescriptionImageSerializer(
+                instance.prescription_images.all(), many=True, context=self.context
+            ).data
+        return data
+
     # The token generation logic from the old VisitSerializer.create method
     # needs to be moved to the ViewSet's perform_create method, as it now
     # depends on the selected Queue.
@@ -95,12 +144,6 @@ class VisitSerializer(serializers.ModelSerializer):
     #     return Visit.objects.create(**validated_data)
 
 
-class VisitStatusSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Visit
-        fields = ["status"]
-
-
 class PrescriptionImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = PrescriptionImage
@@ -1,14 +1,35 @@
 import pytest
+from asgiref.sync import async_to_sync
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User, Group
 from rest_framework.authtoken.models import Token
 from django.core.cache import cache
-from .models import Visit, Patient, Queue
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import (
+    CategoryDailyStats,
+    Visit,
+    VisitEvent,
+    Patient,
+    Queue,
+    QueueDailyStats,
+    PrescriptionImage,
+)
+from . import board
+from .board import invalidate_queue_board
+from .caching import NAMESPACE_VERSION_TIMEOUT, get_namespace_versions
+from .search import phone_ends_with
+from .views import PatientViewSet
 from datetime import date, timedelta
 from freezegun import freeze_time
+from io import StringIO
+from unittest import mock
+import json
 import os
+import re
 
 
 @pytest.mark.django_db
@@ -71,6 +92,41 @@ class PatientAPITests(APITestCase):
         assert response.data["count"] == 2
         assert len(response.data["results"]) == 2
 
+    def _patient_page_queries(self, url, params, patient_count):
+        queue, _ = Queue.objects.get_or_create(name="Last Visits Queue")
+        for index in range(patient_count):
+            patient = Patient.objects.create(name=f"Paged Patient {index}", phone="777")
+            for days_ago in range(7):
+                Visit.objects.create(
+                    patient=patient,
+                    queue=queue,
+                    token_number=index * 10 + days_ago + 1,
+                    visit_date=date.today() - timedelta(days=days_ago),
+                )
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {**params, "page_size": 100})
+        assert response.status_code == status.HTTP_200_OK
+        Patient.objects.filter(name__startswith="Paged Patient").delete()
+        return len(queries), response
+
+    def test_patient_list_last_visit_dates_use_fixed_queries(self):
+        url = reverse("patient-list")
+        few, _ = self._patient_page_queries(url, {}, 1)
+        many, response = self._patient_page_queries(url, {}, 10)
+        assert few == many
+        paged = [p for p in response.data["results"] if p["name"].startswith("Paged Patient")]
+        assert paged[0]["last_5_visit_dates"] == [
+            date.today() - timedelta(days=days_ago) for days_ago in range(5)
+        ]
+
+    def test_patient_search_last_visit_dates_use_fixed_queries(self):
+        url = reverse("patient-search")
+        few, _ = self._patient_page_queries(url, {"q": "Paged"}, 1)
+        many, response = self._patient_page_queries(url, {"q": "Paged"}, 10)
+        assert few == many
+        assert len(response.data["results"][0]["last_5_visit_dates"]) == 5
+
     def test_get_patients_by_registration_numbers(self):
         url = reverse("patient-list")
         numbers = (
@@ -188,6 +244,100 @@ class PatientAPITests(APITestCase):
         assert response.data["count"] == 1
         assert response.data["results"][0]["name"] == self.patient1.name
 
+    def test_search_patient_name_fragment_is_case_insensitive(self):
+        url = reverse("patient-search")
+        response = self.client.get(url, {"q": "wONDER"}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 1
+        assert response.data["results"][0]["name"] == self.patient1.name
+
+    def test_search_patient_short_fragment(self):
+        # Fragments shorter than a trigram fall back to a plain substring scan.
+        url = reverse("patient-search")
+        response = self.client.get(url, {"q": "Bo"}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 1
+        assert response.data["results"][0]["name"] == self.patient2.name
+
+    def test_search_follows_patient_updates_and_deletes(self):
+        # Writes go straight to the model, so the response cache is cleared by
+        # hand to exercise the search index itself.
+        url = reverse("patient-search")
+        self.patient1.name = "Alice Liddell"
+        self.patient1.save()
+
+        assert self.client.get(url, {"q": "Wonderland"}).data["count"] == 0
+        assert self.client.get(url, {"q": "Liddell"}).data["count"] == 1
+
+        self.patient1.delete()
+        cache.clear()
+        assert self.client.get(url, {"q": "Liddell"}).data["count"] == 0
+
+    def test_search_patient_by_phone_suffix_ignores_formatting(self):
+        formatted = Patient.objects.create(name="Carol", phone="+92 300-765 4321")
+        url = reverse("patient-search")
+        for query in ("7654321", "300 7654321", "300-765-4321"):
+            response = self.client.get(url, {"q": query}, format="json")
+            assert response.status_code == status.HTTP_200_OK
+            assert [p["registration_number"] for p in response.data["results"]] == [
+                formatted.registration_number
+            ]
+
+    def test_phone_suffix_search_uses_reversed_digits_index(self):
+        plan = Patient.objects.filter(phone_ends_with("4567")).explain()
+        assert "phone_digits_reversed" in plan
+
+    def test_search_ranks_name_prefix_before_substring_then_by_recent_visit(self):
+        queue = Queue.objects.create(name="Ranking")
+        substring = Patient.objects.create(name="Ali Saraj")
+        prefix_old = Patient.objects.create(name="Sara Bibi")
+        prefix_recent = Patient.objects.create(name="Sara Khan")
+        prefix_never = Patient.objects.create(name="Sarah Noor")
+        Visit.objects.create(
+            patient=prefix_old, queue=queue, token_number=1, visit_date=date(2024, 1, 1)
+        )
+        Visit.objects.create(
+            patient=prefix_recent, queue=queue, token_number=1, visit_date=date(2024, 2, 1)
+        )
+
+        response = self.client.get(reverse("patient-search"), {"q": "sara"})
+        assert [p["registration_number"] for p in response.data["results"]] == [
+            prefix_recent.registration_number,
+            prefix_old.registration_number,
+            prefix_never.registration_number,
+            substring.registration_number,
+        ]
+
+    def test_search_ranks_exact_registration_number_and_phone_first(self):
+        suffix_match = Patient.objects.create(name="Suffix", phone="+92 0300-1234567")
+        exact_phone = Patient.objects.create(name="Exact", phone="0300 1234567")
+        response = self.client.get(reverse("patient-search"), {"q": "0300-1234567"})
+        assert [p["registration_number"] for p in response.data["results"]] == [
+            exact_phone.registration_number,
+            suffix_match.registration_number,
+        ]
+
+        named_after = Patient.objects.create(name=self.patient2.registration_number)
+        response = self.client.get(
+            reverse("patient-search"), {"q": self.patient2.registration_number}
+        )
+        assert [p["registration_number"] for p in response.data["results"]][:2] == [
+            self.patient2.registration_number,
+            named_after.registration_number,
+        ]
+
+    def test_search_matches_name_spelling_variants(self):
+        muhammad = Patient.objects.create(name="Muhammad Usman")
+        mohd = Patient.objects.create(name="Mohd Osman Khan")
+        Patient.objects.create(name="Mahnoor")
+        url = reverse("patient-search")
+        for query in ("Mohammad", "mohammed usman"):
+            response = self.client.get(url, {"q": query})
+            assert {p["registration_number"] for p in response.data["results"]} == {
+                muhammad.registration_number,
+                mohd.registration_number,
+            }
+
     def test_search_patient_no_results(self):
         url = reverse("patient-search")
         response = self.client.get(url, {"q": "NonExistent"}, format="json")
@@ -239,6 +389,301 @@ class PatientAPITests(APITestCase):
         assert api_visit_dates_iso == expected_dates_iso
 
 
+@pytest.mark.django_db
+class PatientAutocompleteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        user = User.objects.create_user(username="autocomplete_tester", password="pass")
+        user.groups.add(assistant_group)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.url = reverse("patient-autocomplete")
+        self.alina = Patient.objects.create(
+            registration_number="0124-01-0001", name="Alina Khan", phone="0300 1110001"
+        )
+        self.alia = Patient.objects.create(
+            registration_number="0124-01-0002", name="Alia Raza", phone="0300-2220002"
+        )
+        self.khalid = Patient.objects.create(
+            registration_number="0124-02-0001", name="Khalid Ali", phone="+92 321 4012401"
+        )
+
+    def _registration_numbers(self, response):
+        return [row["registration_number"] for row in response.data["results"]]
+
+    def test_name_prefix_matches_case_insensitively(self):
+        response = self.client.get(self.url, {"q": "ali"})
+        assert response.status_code == status.HTTP_200_OK
+        # "Khalid Ali" contains "ali" but does not start with it.
+        assert self._registration_numbers(response) == ["0124-01-0002", "0124-01-0001"]
+
+    def test_rows_are_minimal(self):
+        response = self.client.get(self.url, {"q": "Alina"})
+        assert response.data["results"] == [
+            {
+                "registration_number": "0124-01-0001",
+                "name": "Alina Khan",
+                "phone": "0300 1110001",
+                "gender": "OTHER",
+            }
+        ]
+        assert "count" not in response.data
+
+    def test_registration_prefix_ranks_before_phone_suffix(self):
+        # Khalid's phone ends with the digits 012401.
+        response = self.client.get(self.url, {"q": "0124-01"})
+        assert self._registration_numbers(response) == [
+            "0124-01-0001",
+            "0124-01-0002",
+            "0124-02-0001",
+        ]
+
+    def test_phone_suffix_matches(self):
+        response = self.client.get(self.url, {"q": "2220002"})
+        assert self._registration_numbers(response) == ["0124-01-0002"]
+
+    def test_limit_bounds_results_without_counting(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"q": "0124", "limit": 2})
+        assert self._registration_numbers(response) == ["0124-01-0001", "0124-01-0002"]
+        patient_queries = [q["sql"] for q in queries if "api_patient" in q["sql"]]
+        assert len(patient_queries) == 1
+        assert not any("COUNT(" in sql.upper() for sql in patient_queries)
+
+    def test_invalid_requests_are_rejected(self):
+        assert self.client.get(self.url).status_code == status.HTTP_400_BAD_REQUEST
+        for limit in ("0", "26", "many"):
+            response = self.client.get(self.url, {"q": "ali", "limit": limit})
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+            assert "limit" in response.data
+
+
+@pytest.mark.django_db
+class PatientBulkLookupTests(APITestCase):
+    def setUp(self):
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        user = User.objects.create_user(username="bulk_tester", password="pass")
+        user.groups.add(doctor_group)
+        self.token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("patient-bulk")
+        self.numbers = [f"0124-01-{serial:04d}" for serial in range(1, 6)]
+        for number in self.numbers:
+            Patient.objects.create(registration_number=number, name=f"Patient {number}")
+
+    def _post(self, numbers):
+        return self.client.post(self.url, {"registration_numbers": numbers}, format="json")
+
+    def _results(self, response):
+        assert response.status_code == status.HTTP_200_OK
+        assert response.is_async
+
+        async def read():
+            return b"".join([part async for part in response.streaming_content])
+
+        return json.loads(async_to_sync(read)())["results"]
+
+    def test_returns_requested_patients_in_batches(self):
+        requested = list(reversed(self.numbers[:4])) + ["0999-01-0001"]
+        with mock.patch.object(PatientViewSet, "bulk_batch_size", 2):
+            response = self._post(requested)
+            with CaptureQueriesContext(connection) as queries:
+                results = self._results(response)
+
+        assert [row["registration_number"] for row in results] == self.numbers[:4]
+        assert results[0]["name"] == "Patient 0124-01-0001"
+        assert "last_5_visit_dates" in results[0]
+        # Three batches of two numbers: each runs one patient query, plus a
+        # recent-visits query when it found anyone (not the unknown number).
+        assert len(queries) == 5
+
+    def test_batches_are_sent_as_they_are_read(self):
+        async def run():
+            response = await self.async_client.post(
+                self.url,
+                {"registration_numbers": self.numbers},
+                content_type="application/json",
+                headers={"authorization": f"Token {self.token.key}"},
+            )
+            chunks = aiter(response.streaming_content)
+            opening, first_batch = await anext(chunks), await anext(chunks)
+            batches_read = read_rows.call_count
+            rest = [chunk async for chunk in chunks]
+            return opening + first_batch, batches_read, rest
+
+        with (
+            mock.patch.object(PatientViewSet, "bulk_batch_size", 2),
+            mock.patch.object(
+                PatientViewSet,
+                "_bulk_patient_rows",
+                autospec=True,
+                side_effect=PatientViewSet._bulk_patient_rows,
+            ) as read_rows,
+        ):
+            head, batches_read, rest = async_to_sync(run)()
+
+        assert head.startswith(b'{"results":[')
+        assert batches_read == 1
+        assert read_rows.call_count == 3
+        results = json.loads(head + b"".join(rest))["results"]
+        assert [row["registration_number"] for row in results] == self.numbers
+
+    def test_ignores_malformed_numbers(self):
+        results = self._results(self._post([self.numbers[0], "P001", 42, self.numbers[0]]))
+        assert [row["registration_number"] for row in results] == [self.numbers[0]]
+
+    def test_empty_request_streams_empty_results(self):
+        assert self._results(self._post([])) == []
+
+    def test_rejects_missing_or_oversized_lists(self):
+        response = self.client.post(self.url, {"registration_numbers": "0124-01-0001"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        too_many = [f"0124-01-{serial:04d}" for serial in range(5001)]
+        response = self._post(too_many)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "registration_numbers" in response.data
+
+
+@pytest.mark.django_db
+class PatientCacheInvalidationTests(APITestCase):
+    """Patient writes only invalidate the cached responses they affect."""
+
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        user = User.objects.create_user(username="cache_tester", password="pass")
+        user.groups.add(doctor_group)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.alice = Patient.objects.create(name="Alice Cache", phone="111")
+        self.bob = Patient.objects.create(name="Bob Cache", phone="222")
+
+    def _detail_url(self, patient):
+        return reverse("patient-detail", kwargs={"registration_number": patient.pk})
+
+    def test_update_refreshes_own_detail_and_keeps_other_details_cached(self):
+        self.client.get(self._detail_url(self.alice))
+        self.client.get(self._detail_url(self.bob))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                self._detail_url(self.alice), {"phone": "999"}, format="json"
+            )
+        assert response.status_code == status.HTTP_200_OK
+        # Change Bob behind the API's back: his cached detail is still served.
+        Patient.objects.filter(pk=self.bob.pk).update(phone="000")
+
+        assert self.client.get(self._detail_url(self.alice)).data["phone"] == "999"
+        assert self.client.get(self._detail_url(self.bob)).data["phone"] == "222"
+
+    def test_create_refreshes_list_and_search(self):
+        list_url = reverse("patient-list")
+        search_url = reverse("patient-search")
+        assert self.client.get(list_url).data["count"] == 2
+        assert self.client.get(search_url, {"q": "Cache"}).data["count"] == 2
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(list_url, {"name": "Carol Cache"}, format="json")
+
+        assert self.client.get(list_url).data["count"] == 3
+        assert self.client.get(search_url, {"q": "Cache"}).data["count"] == 3
+
+    def test_patient_write_keeps_queue_list_cached(self):
+        queue_count = len(self.client.get(reverse("queue-list")).data)
+
+        Queue.objects.create(name="Uncached Queue")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("patient-list"), {"name": "Dave Cache"}, format="json")
+
+        assert len(self.client.get(reverse("queue-list")).data) == queue_count
+
+    def test_visit_creation_refreshes_patient_last_visit_dates(self):
+        queue = Queue.objects.create(name="Visit Cache Queue")
+        assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        User.objects.get(username="cache_tester").groups.add(assistant_group)
+        list_url = reverse("patient-list")
+        assert list(self.client.get(self._detail_url(self.alice)).data["last_5_visit_dates"]) == []
+        assert all(not p["last_5_visit_dates"] for p in self.client.get(list_url).data["results"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("visit-list"), {"patient": self.alice.pk, "queue": queue.pk}, format="json"
+            )
+
+        detail = self.client.get(self._detail_url(self.alice))
+        assert list(detail.data["last_5_visit_dates"]) == [date.today()]
+        listed = {p["registration_number"]: p for p in self.client.get(list_url).data["results"]}
+        assert list(listed[self.alice.pk]["last_5_visit_dates"]) == [date.today()]
+
+    def test_visit_creation_keeps_autocomplete_cached(self):
+        queue = Queue.objects.create(name="Autocomplete Cache Queue")
+        assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        User.objects.get(username="cache_tester").groups.add(assistant_group)
+        url = reverse("patient-autocomplete")
+        assert len(self.client.get(url, {"q": "Alice"}).data["results"]) == 1
+
+        # Rename Alice behind the API's back, then create a visit for her.
+        Patient.objects.filter(pk=self.alice.pk).update(name="Zed Cache")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("visit-list"), {"patient": self.alice.pk, "queue": queue.pk}, format="json"
+            )
+        assert len(self.client.get(url, {"q": "Alice"}).data["results"]) == 1
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("patient-list"), {"name": "Alice Two"}, format="json")
+        assert [row["name"] for row in self.client.get(url, {"q": "Alice"}).data["results"]] == [
+            "Alice Two"
+        ]
+
+    def test_namespace_versions_age_out(self):
+        with freeze_time("2025-01-01 08:00:00") as frozen:
+            first = get_namespace_versions(["patients"])["patients"]
+            frozen.tick(NAMESPACE_VERSION_TIMEOUT + 1)
+            assert cache.get("cache-ns:patients") is None
+            assert get_namespace_versions(["patients"])["patients"] > first
+
+
+@pytest.mark.django_db
+class ResponseCacheScopeTests(APITestCase):
+    """Cached responses are shared per role set, never across role sets."""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        self.assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        Queue.objects.create(name="Scope Queue")
+
+    def _credentials(self, username, *groups):
+        user = User.objects.create_user(username=username, password="pass")
+        user.groups.add(*groups)
+        return {"HTTP_AUTHORIZATION": f"Token {Token.objects.create(user=user).key}"}
+
+    def test_same_roles_share_entries_and_other_roles_do_not(self):
+        first_doctor = self._credentials("doc_one", self.doctor_group)
+        second_doctor = self._credentials("doc_two", self.doctor_group)
+        assistant = self._credentials("assistant_one", self.assistant_group)
+        url = reverse("queue-list")
+
+        queue_count = len(self.client.get(url, **first_doctor).data)
+        Queue.objects.create(name="Late Queue")
+
+        assert len(self.client.get(url, **second_doctor).data) == queue_count
+        assert len(self.client.get(url, **assistant).data) == queue_count + 1
+
+    def test_cached_responses_are_private(self):
+        doctor = self._credentials("doc_private", self.doctor_group)
+        url = reverse("queue-list")
+
+        for _ in range(2):
+            response = self.client.get(url, **doctor)
+            assert "private" in response["Cache-Control"]
+            assert "max-age" not in response["Cache-Control"]
+            assert "Authorization" in response["Vary"]
+
+
 @pytest.mark.django_db
 class QueueAPITests(APITestCase):
     def setUp(self):
@@ -271,6 +716,432 @@ class QueueAPITests(APITestCase):
         assert response.data["name"] == self.queue1.name
 
 
+@pytest.mark.django_db
+class QueueBoardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        user = User.objects.create_user(username="board_tester", password="pass")
+        user.groups.add(doctor_group)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        self.queue = Queue.objects.create(name="Board Queue")
+        self.other_queue = Queue.objects.create(name="Other Board Queue")
+        self.alice = Patient.objects.create(name="Alice Board")
+        self.bob = Patient.objects.create(name="Bob Board")
+        self.carol = Patient.objects.create(name="Carol Board")
+
+    def _visit(self, patient, token, status_value, queue=None, visit_date=None):
+        return Visit.objects.create(
+            patient=patient,
+            queue=queue or self.queue,
+            token_number=token,
+            status=status_value,
+            visit_date=visit_date or date.today(),
+        )
+
+    def test_board_lists_in_room_and_waiting_in_token_order(self):
+        self._visit(self.alice, 3, "WAITING")
+        self._visit(self.bob, 1, "IN_ROOM")
+        self._visit(self.carol, 2, "WAITING")
+        self._visit(self.carol, 4, "DONE")
+        self._visit(self.alice, 5, "START")
+        self._visit(self.alice, 1, "WAITING", queue=self.other_queue)
+        self._visit(self.bob, 9, "WAITING", visit_date=date.today() - timedelta(days=1))
+
+        url = reverse("queue-board", kwargs={"pk": self.queue.pk})
+        response = self.client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["queue"] == {"id": self.queue.pk, "name": self.queue.name}
+        assert response.data["in_room"] == [
+            {
+                "id": Visit.objects.get(token_number=1, queue=self.queue).pk,
+                "token_number": 1,
+                "patient_registration_number": self.bob.registration_number,
+                "patient_full_name": "Bob Board",
+                "position": 1,
+            }
+        ]
+        waiting = response.data["waiting"]
+        assert [entry["token_number"] for entry in waiting] == [2, 3]
+        assert [entry["position"] for entry in waiting] == [1, 2]
+        assert [entry["patient_full_name"] for entry in waiting] == ["Carol Board", "Alice Board"]
+
+    def test_board_is_cached_until_a_visit_in_the_queue_changes(self):
+        visit = self._visit(self.alice, 1, "WAITING")
+        url = reverse("queue-board", kwargs={"pk": self.queue.pk})
+        assert len(self.client.get(url).data["waiting"]) == 1
+
+        # Writes that bypass the API do not invalidate the cached board.
+        self._visit(self.bob, 2, "WAITING")
+        assert len(self.client.get(url).data["waiting"]) == 1
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse("visit-start", kwargs={"pk": visit.pk}))
+
+        response = self.client.get(url)
+        assert [entry["token_number"] for entry in response.data["waiting"]] == [2]
+
+    def test_board_built_while_a_write_commits_is_not_served_afterwards(self):
+        visit = self._visit(self.alice, 1, "WAITING")
+        url = reverse("queue-board", kwargs={"pk": self.queue.pk})
+        build_queue_board = board.build_queue_board
+
+        def build_then_commit(queue, visit_date):
+            payload = build_queue_board(queue, visit_date)
+            # The writer commits and invalidates before this reader stores its board.
+            Visit.objects.filter(pk=visit.pk).update(status="START")
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_queue_board(visit)
+            return payload
+
+        with mock.patch("api.board.build_queue_board", side_effect=build_then_commit):
+            assert len(self.client.get(url).data["waiting"]) == 1
+
+        assert self.client.get(url).data["waiting"] == []
+
+    def test_moving_a_visit_refreshes_the_boards_of_both_queues(self):
+        visit = self._visit(self.alice, 1, "WAITING")
+        url = reverse("queue-board", kwargs={"pk": self.queue.pk})
+        other_url = reverse("queue-board", kwargs={"pk": self.other_queue.pk})
+        assert len(self.client.get(url).data["waiting"]) == 1
+        assert self.client.get(other_url).data["waiting"] == []
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse("visit-detail", kwargs={"pk": visit.pk}),
+                {"queue": self.other_queue.pk},
+                format="json",
+            )
+        assert response.status_code == status.HTTP_200_OK
+
+        assert self.client.get(url).data["waiting"] == []
+        assert [entry["id"] for entry in self.client.get(other_url).data["waiting"]] == [visit.pk]
+
+    def test_deleting_a_visit_refreshes_its_board(self):
+        visit = self._visit(self.alice, 1, "WAITING")
+        url = reverse("queue-board", kwargs={"pk": self.queue.pk})
+        assert len(self.client.get(url).data["waiting"]) == 1
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse("visit-detail", kwargs={"pk": visit.pk}))
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        assert self.client.get(url).data["waiting"] == []
+
+
+@pytest.mark.django_db
+class WaitEstimateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        user = User.objects.create_user(username="wait_doctor", password="pass")
+        user.groups.add(doctor_group)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        self.patient = Patient.objects.create(name="Wait Patient")
+        self.queue = Queue.objects.create(name="Wait Queue")
+        self.today = date.today().isoformat()
+
+    def _visit(self, token, status_value="WAITING"):
+        return Visit.objects.create(
+            patient=self.patient, queue=self.queue, token_number=token, status=status_value
+        )
+
+    def _serve(self, visit, minutes):
+        with self.captureOnCommitCallbacks(execute=True):
+            with freeze_time(f"{self.today} 10:00:00"):
+                self.client.patch(reverse("visit-start", kwargs={"pk": visit.pk}))
+                self.client.patch(reverse("visit-in-room", kwargs={"pk": visit.pk}))
+            with freeze_time(f"{self.today} 10:{minutes:02d}:00"):
+                self.client.patch(reverse("visit-done", kwargs={"pk": visit.pk}))
+
+    def test_estimates_are_unknown_until_a_visit_is_done(self):
+        self._visit(1)
+        board = self.client.get(reverse("queue-board", kwargs={"pk": self.queue.pk})).data
+        assert board["service_time_seconds"] is None
+        assert board["waiting"][0]["estimated_wait_seconds"] is None
+        visits = self.client.get(reverse("visit-list"), {"queue": self.queue.pk}).data
+        assert visits["results"][0]["estimated_wait_seconds"] is None
+
+    def test_done_visits_update_a_moving_average_of_room_time(self):
+        self._serve(self._visit(1), 10)
+        self._serve(self._visit(2), 5)
+        waiting = [self._visit(3), self._visit(4)]
+        self._visit(5, "START")
+
+        # 0.2 * 300s + 0.8 * 600s
+        board = self.client.get(reverse("queue-board", kwargs={"pk": self.queue.pk})).data
+        assert board["service_time_seconds"] == 540
+        assert [entry["estimated_wait_seconds"] for entry in board["waiting"]] == [540, 1080]
+
+        response = self.client.get(reverse("visit-list"), {"queue": self.queue.pk})
+        estimates = {row["id"]: row["estimated_wait_seconds"] for row in response.data["results"]}
+        assert estimates[waiting[0].pk] == 540
+        assert estimates[waiting[1].pk] == 1080
+        assert [value for value in estimates.values() if value is not None] == [540, 1080]
+
+    def test_bulk_done_feeds_the_model(self):
+        visit = self._visit(1, "START")
+        with freeze_time(f"{self.today} 09:00:00"):
+            self.client.patch(reverse("visit-in-room", kwargs={"pk": visit.pk}))
+        with self.captureOnCommitCallbacks(execute=True):
+            with freeze_time(f"{self.today} 09:04:00"):
+                self.client.post(
+                    reverse("visit-bulk-transition"),
+                    {"action": "done", "ids": [visit.pk]},
+                    format="json",
+                )
+        self._visit(2)
+        board = self.client.get(reverse("queue-board", kwargs={"pk": self.queue.pk})).data
+        assert board["waiting"][0]["estimated_wait_seconds"] == 240
+
+    def test_model_update_changes_the_visit_list_etag(self):
+        self._visit(1)
+        url = reverse("visit-list")
+        params = {"status": "WAITING", "queue": self.queue.pk}
+        etag = self.client.get(url, params)["ETag"]
+
+        other_queue = Queue.objects.create(name="Other Wait Queue")
+        served = Visit.objects.create(
+            patient=self.patient, queue=other_queue, token_number=1, status="WAITING"
+        )
+        self._serve(served, 3)
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class QueueAnalyticsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        self.doctor = User.objects.create_user(username="stats_doctor", password="pass")
+        self.doctor.groups.add(doctor_group)
+        self.assistant = User.objects.create_user(username="stats_assistant", password="pass")
+        self.assistant.groups.add(assistant_group)
+        self.queue = Queue.objects.create(name="Stats Queue")
+        self.cash = Patient.objects.create(name="Cash Patient", category="03")
+        self.free = Patient.objects.create(name="Free Patient", category="04")
+        self.url = reverse("queue-analytics")
+
+    def _as(self, user):
+        self.client.force_authenticate(user)
+
+    def _run_day(self, day):
+        """Create three visits on ``day``; serve two and leave one waiting."""
+        visits = []
+        self._as(self.assistant)
+        with freeze_time(f"{day} 09:00:00"):
+            for patient in (self.cash, self.free, self.free):
+                response = self.client.post(
+                    reverse("visit-list"),
+                    {"patient": patient.registration_number, "queue": self.queue.pk},
+                    format="json",
+                )
+                visits.append(response.data["id"])
+        self._as(self.doctor)
+        for visit_id, minute in zip(visits[:2], (10, 30)):
+            with freeze_time(f"{day} 09:{minute}:00"):
+                self.client.patch(reverse("visit-start", kwargs={"pk": visit_id}))
+                self.client.patch(reverse("visit-in-room", kwargs={"pk": visit_id}))
+            with freeze_time(f"{day} 09:{minute + 5}:00"):
+                self.client.patch(reverse("visit-done", kwargs={"pk": visit_id}))
+
+    def _day_results(self):
+        self._as(self.doctor)
+        response = self.client.get(self.url, {"since": "2025-03-01", "until": "2025-04-30"})
+        assert response.status_code == status.HTTP_200_OK
+        return response.data["results"]
+
+    def test_visit_writes_update_the_daily_rollups(self):
+        self._run_day("2025-03-10")
+        self._run_day("2025-04-02")
+
+        results = self._day_results()
+        assert [entry["period"] for entry in results] == ["2025-03-10", "2025-04-02"]
+        assert results[0] == {
+            "period": "2025-03-10",
+            "queue": {"id": self.queue.pk, "name": "Stats Queue"},
+            "visits": 3,
+            "done": 2,
+            # Waits of 10 and 30 minutes; 5 minutes in the room each.
+            "average_wait_seconds": 1200,
+            "average_service_seconds": 300,
+            "categories": {"03": 1, "04": 2},
+        }
+
+        response = self.client.get(
+            self.url, {"since": "2025-01-01", "until": "2025-12-31", "period": "year"}
+        )
+        (year,) = response.data["results"]
+        assert year["period"] == "2025-01-01"
+        assert (year["visits"], year["done"]) == (6, 4)
+        assert year["categories"] == {"03": 2, "04": 4}
+
+    def test_visit_edits_and_deletes_update_the_daily_rollups(self):
+        self._run_day("2025-03-10")
+        other = Queue.objects.create(name="Other Stats Queue")
+        done, _, waiting = Visit.objects.filter(queue=self.queue).order_by("token_number")
+        self._as(self.assistant)
+
+        # Move a done visit to another queue, then the waiting one to another patient.
+        response = self.client.patch(
+            reverse("visit-detail", kwargs={"pk": done.pk}), {"queue": other.pk}, format="json"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        response = self.client.patch(
+            reverse("visit-detail", kwargs={"pk": waiting.pk}),
+            {"patient": self.cash.registration_number},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        moved, stayed = sorted(self._day_results(), key=lambda entry: entry["queue"]["name"])
+        assert (moved["queue"]["id"], moved["visits"], moved["done"]) == (other.pk, 1, 1)
+        assert moved["categories"] == {"03": 1}
+        assert (stayed["visits"], stayed["done"]) == (2, 1)
+        assert stayed["categories"] == {"03": 1, "04": 1}
+        # The wait and room time were spent in the original queue.
+        assert moved["average_wait_seconds"] is None
+        assert stayed["average_wait_seconds"] == 1200
+
+        response = self.client.delete(reverse("visit-detail", kwargs={"pk": waiting.pk}))
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        _, stayed = sorted(self._day_results(), key=lambda entry: entry["queue"]["name"])
+        assert (stayed["visits"], stayed["done"]) == (1, 1)
+        assert stayed["categories"] == {"04": 1}
+
+        incremental = self._day_results()
+        call_command("rebuild_rollups", since="2025-03-01", stdout=StringIO())
+        assert self._day_results() == incremental
+
+    def test_removing_counts_stops_at_zero(self):
+        QueueDailyStats.objects.create(queue=self.queue, visit_date=date(2025, 5, 1), visits=1)
+
+        QueueDailyStats.remove(self.queue.pk, date(2025, 5, 1), visits=2, done=1)
+        QueueDailyStats.remove(self.queue.pk, date(2025, 5, 2), visits=1)
+        CategoryDailyStats.remove(self.queue.pk, date(2025, 5, 1), "01")
+
+        stats = QueueDailyStats.objects.get()
+        assert (stats.visit_date, stats.visits, stats.done) == (date(2025, 5, 1), 0, 0)
+        assert not CategoryDailyStats.objects.exists()
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        self._run_day("2025-03-10")
+        self._run_day("2025-04-02")
+        incremental = self._day_results()
+
+        QueueDailyStats.objects.all().delete()
+        CategoryDailyStats.objects.all().delete()
+        # Days before --since are not rebuilt.
+        call_command("rebuild_rollups", since="2025-04-01", stdout=StringIO())
+        assert [entry["period"] for entry in self._day_results()] == ["2025-04-02"]
+
+        call_command("rebuild_rollups", since="2025-03-01", stdout=StringIO())
+        assert self._day_results() == incremental
+
+    def test_monthly_totals_filtered_by_queue(self):
+        other = Queue.objects.create(name="Other Stats Queue")
+        QueueDailyStats.objects.create(queue=self.queue, visit_date=date(2025, 5, 1), visits=4)
+        QueueDailyStats.objects.create(queue=self.queue, visit_date=date(2025, 5, 20), visits=6)
+        QueueDailyStats.objects.create(queue=other, visit_date=date(2025, 5, 2), visits=9)
+        self._as(self.doctor)
+
+        response = self.client.get(
+            self.url,
+            {
+                "since": "2025-05-01",
+                "until": "2025-05-31",
+                "period": "month",
+                "queue": self.queue.pk,
+            },
+        )
+        (month,) = response.data["results"]
+        assert month["period"] == "2025-05-01"
+        assert month["visits"] == 10
+        assert month["average_wait_seconds"] is None
+
+    def test_invalid_parameters_and_non_doctors_are_rejected(self):
+        self._as(self.doctor)
+        for params in ({"period": "week"}, {"since": "yesterday"}, {"queue": "x"}):
+            response = self.client.get(self.url, params)
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+        self._as(self.assistant)
+        assert self.client.get(self.url).status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class QueueCallNextTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        self.doctor = User.objects.create_user(username="caller", password="pass")
+        self.doctor.groups.add(doctor_group)
+        self.assistant = User.objects.create_user(username="not_a_caller", password="pass")
+        self.assistant.groups.add(assistant_group)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.doctor).key}"
+        )
+        self.queue = Queue.objects.create(name="Call Queue")
+        self.url = reverse("queue-call-next", kwargs={"pk": self.queue.pk})
+        self.patient = Patient.objects.create(name="Caller Patient")
+
+    def _visit(self, token, status_value="WAITING", visit_date=None):
+        return Visit.objects.create(
+            patient=self.patient,
+            queue=self.queue,
+            token_number=token,
+            status=status_value,
+            visit_date=visit_date or date.today(),
+        )
+
+    def test_calls_lowest_waiting_token_of_today(self):
+        self._visit(1, "DONE")
+        self._visit(1, visit_date=date.today() - timedelta(days=1))
+        third = self._visit(3)
+        second = self._visit(2)
+
+        first_call = self.client.post(self.url)
+        second_call = self.client.post(self.url)
+
+        assert first_call.status_code == status.HTTP_200_OK
+        assert first_call.data["id"] == second.pk
+        assert first_call.data["status"] == "START"
+        assert VisitEvent.objects.get(visit=second).status == "START"
+        assert second_call.data["id"] == third.pk
+        assert Visit.objects.get(pk=second.pk).status == "START"
+
+    def test_empty_queue_is_not_found(self):
+        self._visit(1, "START")
+        response = self.client.post(self.url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_call_refreshes_the_board(self):
+        self._visit(1)
+        board_url = reverse("queue-board", kwargs={"pk": self.queue.pk})
+        assert len(self.client.get(board_url).data["waiting"]) == 1
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url)
+
+        board = self.client.get(board_url).data
+        assert board["waiting"] == []
+        assert board["in_room"] == []
+
+    def test_requires_doctor(self):
+        self._visit(1)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.assistant).key}"
+        )
+        response = self.client.post(self.url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
 @pytest.mark.django_db
 class VisitAPITests(APITestCase):
     def setUp(self):
@@ -412,6 +1283,115 @@ class VisitAPITests(APITestCase):
         assert response_all_waiting.status_code == status.HTTP_200_OK
         assert response_all_waiting.data["count"] == 2
 
+    def test_visit_list_conditional_get(self):
+        """A poll with a matching If-None-Match gets a 304 until the set changes."""
+        visit = Visit.objects.create(
+            patient=self.patient,
+            queue=self.queue1,
+            token_number=1,
+            visit_date=date.today(),
+            status="WAITING",
+        )
+        url = reverse("visit-list") + f"?status=WAITING&queue={self.queue1.pk}"
+
+        first = self.client.get(url)
+        assert first.status_code == status.HTTP_200_OK
+        etag = first["ETag"]
+
+        unchanged = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert unchanged.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # Leaving the filtered set must change the ETag.
+        Visit.objects.filter(pk=visit.pk).update(status="START")
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.data["count"] == 0
+        assert changed["ETag"] != etag
+
+    def test_visit_list_etag_differs_per_page(self):
+        url = reverse("visit-list")
+        first_page = self.client.get(url, {"page_size": 1})
+        second_request = self.client.get(
+            url, {"page_size": 2}, HTTP_IF_NONE_MATCH=first_page["ETag"]
+        )
+        assert second_request.status_code == status.HTTP_200_OK
+
+    def _expanded_list_queries(self, visit_count):
+        for index in range(visit_count):
+            patient = Patient.objects.create(name=f"Expand {visit_count}-{index}")
+            visit = Visit.objects.create(
+                patient=patient, queue=self.queue1, token_number=index + 1, status="WAITING"
+            )
+            Visit.objects.create(
+                patient=patient,
+                queue=self.queue2,
+                token_number=index + 1,
+                visit_date=date.today() - timedelta(days=3),
+                status="DONE",
+            )
+            PrescriptionImage.objects.create(visit=visit, image_url="https://example.com/rx.jpg")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("visit-list"),
+                {"queue": self.queue1.pk, "expand": "patient,prescriptions", "page_size": 100},
+            )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == visit_count
+        Visit.objects.all().delete()
+        return len(queries), response
+
+    def test_visit_list_expand_embeds_patient_and_prescriptions(self):
+        _, response = self._expanded_list_queries(2)
+        entry = response.data["results"][0]
+        assert entry["patient_details"]["registration_number"] == entry["patient"]
+        assert entry["patient_details"]["last_5_visit_dates"] == [
+            date.today(),
+            date.today() - timedelta(days=3),
+        ]
+        assert [image["image_url"] for image in entry["prescription_images"]] == [
+            "https://example.com/rx.jpg"
+        ]
+
+    def test_visit_list_expanded_etag_reads_expansions_through_subqueries(self):
+        self._expanded_list_queries(3)
+        visit = Visit.objects.create(patient=self.patient, queue=self.queue1, token_number=1)
+        image = PrescriptionImage.objects.create(visit=visit, image_url="https://example.com/a.jpg")
+        params = {"queue": self.queue1.pk, "expand": "patient,prescriptions"}
+
+        with CaptureQueriesContext(connection) as queries:
+            etag = self.client.get(reverse("visit-list"), params)["ETag"]
+        stamp = next(q["sql"] for q in queries.captured_queries if "MAX(" in q["sql"])
+        # Joining the visits' prescriptions or other visits would repeat each row.
+        assert "OUTER JOIN" not in stamp
+
+        # Each expansion still feeds the ETag.
+        PrescriptionImage.objects.create(visit=visit, image_url="https://example.com/b.jpg")
+        assert self.client.get(reverse("visit-list"), params)["ETag"] != etag
+        etag = self.client.get(reverse("visit-list"), params)["ETag"]
+        image.delete()
+        assert self.client.get(reverse("visit-list"), params)["ETag"] != etag
+        etag = self.client.get(reverse("visit-list"), params)["ETag"]
+        Visit.objects.create(
+            patient=self.patient, queue=self.queue2, token_number=1, visit_date=date(2020, 1, 1)
+        )
+        assert self.client.get(reverse("visit-list"), params)["ETag"] != etag
+
+    def test_visit_list_expand_uses_fixed_number_of_queries(self):
+        few, _ = self._expanded_list_queries(1)
+        many, _ = self._expanded_list_queries(8)
+        assert few == many
+
+    def test_visit_list_without_expand_has_no_embedded_data(self):
+        Visit.objects.create(patient=self.patient, queue=self.queue1, token_number=1)
+        entry = self.client.get(reverse("visit-list")).data["results"][0]
+        assert "patient_details" not in entry
+        assert "prescription_images" not in entry
+
+    def test_visit_list_rejects_unknown_expand(self):
+        response = self.client.get(reverse("visit-list"), {"expand": "patient,doctor"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "expand" in response.data
+
     def test_patch_visit_done_api(self):
         visit = Visit.objects.create(
             patient=self.patient,
@@ -523,6 +1503,104 @@ class VisitAPITests(APITestCase):
         assert visit.queue == self.queue1
 
 
+@pytest.mark.django_db
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        user = User.objects.create_user(username="cursor_tester", password="pass")
+        user.groups.add(doctor_group)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def _walk(self, url, params):
+        """Follow ``next`` links from the first cursor page, collecting every page."""
+        pages = []
+        response = self.client.get(url, {**params, "cursor": ""})
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            assert "count" not in response.data
+            pages.append(response.data["results"])
+            if response.data["next"] is None:
+                return pages
+            response = self.client.get(response.data["next"])
+
+    def test_patient_pages_follow_registration_number(self):
+        for serial in range(1, 8):
+            Patient.objects.create(registration_number=f"0124-01-{serial:04d}", name="P")
+
+        pages = self._walk(reverse("patient-list"), {"page_size": 3})
+        assert [len(page) for page in pages] == [3, 3, 1]
+        numbers = [row["registration_number"] for page in pages for row in page]
+        assert numbers == [f"0124-01-{serial:04d}" for serial in range(1, 8)]
+
+    def test_visit_pages_follow_date_queue_and_token(self):
+        patient = Patient.objects.create(name="Walker")
+        queue_b = Queue.objects.create(name="B")
+        queue_a = Queue.objects.create(name="A")
+        expected = []
+        for visit_date in (date(2024, 1, 1), date(2024, 1, 2)):
+            for queue in (queue_b, queue_a):
+                for token in (1, 2):
+                    Visit.objects.create(
+                        patient=patient, queue=queue, token_number=token, visit_date=visit_date
+                    )
+                    expected.append((visit_date.isoformat(), queue.id, token))
+
+        pages = self._walk(reverse("visit-list"), {"page_size": 3})
+        assert [len(page) for page in pages] == [3, 3, 2]
+        walked = [
+            (row["visit_date"], row["queue"], row["token_number"]) for page in pages for row in page
+        ]
+        assert walked == sorted(expected)
+
+    @pytest.mark.skipif(connection.vendor != "sqlite", reason="reads SQLite query plans")
+    def test_visit_cursor_page_seeks_the_keyset_index(self):
+        patient = Patient.objects.create(name="Seeker")
+        queue = Queue.objects.create(name="Seek Queue")
+        for day in (1, 2, 3):
+            for token in (1, 2):
+                Visit.objects.create(
+                    patient=patient, queue=queue, token_number=token, visit_date=date(2024, 1, day)
+                )
+        first = self.client.get(reverse("visit-list"), {"cursor": "", "page_size": 3})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(first.data["next"])
+        assert [row["visit_date"] for row in response.data["results"]] == [
+            "2024-01-02",
+            "2024-01-03",
+            "2024-01-03",
+        ]
+        (page_sql,) = [q["sql"] for q in queries if 'FROM "api_visit"' in q["sql"]]
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + page_sql)
+            plan = "\n".join(str(row[-1]) for row in cursor.fetchall())
+        assert re.search(r"SEARCH api_visit USING INDEX \S+ \(visit_date>\?\)", plan), plan
+
+    def test_deep_pages_run_no_count_or_offset(self):
+        for serial in range(1, 6):
+            Patient.objects.create(registration_number=f"0124-01-{serial:04d}", name="P")
+        first = self.client.get(reverse("patient-list"), {"cursor": "", "page_size": 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(first.data["next"])
+        assert response.status_code == status.HTTP_200_OK
+        sql = " ".join(q["sql"].upper() for q in queries)
+        assert "COUNT(" not in sql
+        assert "OFFSET" not in sql
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ("not-base64!", "WyJ4Il0=", "WyJub3QtYS1kYXRlIiwxLDFd"):
+            response = self.client.get(reverse("visit-list"), {"cursor": cursor})
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_page_number_pagination_is_unchanged_without_cursor(self):
+        Patient.objects.create(name="Counted")
+        response = self.client.get(reverse("patient-list"))
+        assert response.data["count"] == 1
+
+
 @pytest.mark.django_db
 class VisitLifecycleTests(APITestCase):
     def setUp(self):
@@ -594,7 +1672,7 @@ class VisitLifecycleTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.doctor_token.key}")
         url = self._get_url("in-room", self.visit.pk)
         response = self.client.patch(url)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
         self.visit.refresh_from_db()
         self.assertEqual(self.visit.status, "WAITING")
 
@@ -602,10 +1680,80 @@ class VisitLifecycleTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.doctor_token.key}")
         url = self._get_url("done", self.visit.pk)
         response = self.client.patch(url)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
         self.visit.refresh_from_db()
         self.assertEqual(self.visit.status, "WAITING")
 
+    def test_second_concurrent_start_conflicts(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.doctor_token.key}")
+        url = self._get_url("start", self.visit.pk)
+        first = self.client.patch(url)
+        second = self.client.patch(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(second.data["status"], "START")
+
+    def test_transition_is_one_conditional_update(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.doctor_token.key}")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self._get_url("start", self.visit.pk))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        visit_queries = [q["sql"] for q in queries if '"api_visit"' in q["sql"]]
+        self.assertEqual(len(visit_queries), 2)
+        self.assertTrue(visit_queries[0].startswith('UPDATE "api_visit"'))
+        self.assertIn('"api_visit"."status" IN', visit_queries[0])
+
+    def test_transition_of_missing_visit_is_not_found(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.doctor_token.key}")
+        response = self.client.patch(self._get_url("start", self.visit.pk + 1000))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_creation_and_transitions_append_visit_events(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.assistant_token.key}")
+        response = self.client.post(
+            reverse("visit-list"),
+            {"patient": self.patient.registration_number, "queue": self.queue.pk},
+            format="json",
+        )
+        visit_id = response.data["id"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.doctor_token.key}")
+        for action in ("start", "send-back-to-waiting", "start", "in-room", "done"):
+            self.client.patch(self._get_url(action, visit_id))
+        # A rejected transition records nothing.
+        self.client.patch(self._get_url("done", visit_id))
+
+        events = VisitEvent.objects.filter(visit_id=visit_id).order_by("timestamp", "id")
+        self.assertEqual(
+            [event.status for event in events],
+            ["WAITING", "START", "WAITING", "START", "IN_ROOM", "DONE"],
+        )
+        visit = Visit.objects.get(pk=visit_id)
+        self.assertEqual(events.last().timestamp, visit.updated_at)
+        self.assertEqual(
+            {(event.queue_id, event.visit_date) for event in events},
+            {(self.queue.pk, visit.visit_date)},
+        )
+
+    def test_deleting_a_visit_keeps_its_events(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.doctor_token.key}")
+        self.client.patch(self._get_url("start", self.visit.pk))
+        response = self.client.delete(reverse("visit-detail", kwargs={"pk": self.visit.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        events = VisitEvent.objects.filter(visit_id=self.visit.pk)
+        self.assertEqual(
+            list(events.values_list("queue_id", "visit_date", "status")),
+            [(self.queue.pk, self.visit.visit_date, "START")],
+        )
+
+    def test_day_of_queue_events_is_read_from_the_range_index(self):
+        plan = (
+            VisitEvent.objects.filter(queue=self.queue, visit_date=date.today())
+            .order_by("timestamp")
+            .explain()
+        )
+        self.assertIn("api_visitevent_range_idx", plan)
+
     def test_assistant_cannot_change_status(self):
         self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.assistant_token.key}")
         url = self._get_url("start", self.visit.pk)
@@ -623,6 +1771,196 @@ class VisitLifecycleTests(APITestCase):
         self.assertEqual(self.visit.status, "WAITING")
 
 
+@pytest.mark.django_db
+class BulkTransitionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        self.doctor = User.objects.create_user(username="bulk_doctor", password="pass")
+        self.doctor.groups.add(doctor_group)
+        self.assistant = User.objects.create_user(username="bulk_assistant", password="pass")
+        self.assistant.groups.add(assistant_group)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.doctor).key}"
+        )
+        self.url = reverse("visit-bulk-transition")
+        patient = Patient.objects.create(name="Bulk Patient")
+        self.queue = Queue.objects.create(name="Bulk Queue")
+        self.other_queue = Queue.objects.create(name="Other Bulk Queue")
+        self.in_room = [
+            Visit.objects.create(
+                patient=patient, queue=self.queue, token_number=n, status="IN_ROOM"
+            )
+            for n in (1, 2)
+        ]
+        self.waiting = Visit.objects.create(
+            patient=patient, queue=self.queue, token_number=3, status="WAITING"
+        )
+        self.elsewhere = Visit.objects.create(
+            patient=patient, queue=self.other_queue, token_number=1, status="IN_ROOM"
+        )
+
+    def _statuses(self):
+        return dict(Visit.objects.values_list("pk", "status"))
+
+    def test_ids_report_an_outcome_per_visit(self):
+        ids = [self.in_room[0].pk, self.waiting.pk, 99999, self.in_room[1].pk]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {"action": "done", "ids": ids}, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["updated"] == 2
+        assert response.data["results"] == [
+            {"id": self.in_room[0].pk, "outcome": "updated"},
+            {"id": self.waiting.pk, "outcome": "conflict", "status": "WAITING"},
+            {"id": 99999, "outcome": "not_found"},
+            {"id": self.in_room[1].pk, "outcome": "updated"},
+        ]
+        statuses = self._statuses()
+        assert [statuses[visit.pk] for visit in self.in_room] == ["DONE", "DONE"]
+        assert sorted(VisitEvent.objects.values_list("visit_id", "status")) == [
+            (visit.pk, "DONE") for visit in self.in_room
+        ]
+        assert statuses[self.waiting.pk] == "WAITING"
+
+    def test_filter_moves_every_eligible_visit_in_the_queue_with_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url,
+                {"action": "send_back_to_waiting", "filter": {"queue": self.queue.pk}},
+                format="json",
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [row["id"] for row in response.data["results"]] == [v.pk for v in self.in_room]
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "api_visit"')]
+        assert len(updates) == 1
+        statuses = self._statuses()
+        assert statuses[self.in_room[0].pk] == "WAITING"
+        assert statuses[self.elsewhere.pk] == "IN_ROOM"
+
+    def test_updated_visits_are_published(self):
+        with mock.patch("api.views.publish_visit_change") as publish:
+            self.client.post(
+                self.url, {"action": "done", "ids": [self.in_room[0].pk]}, format="json"
+            )
+        [(visit,), _] = publish.call_args
+        assert visit.pk == self.in_room[0].pk
+        assert visit.status == "DONE"
+
+    def test_invalid_requests_are_rejected(self):
+        for body in (
+            {"action": "teleport", "ids": [1]},
+            {"action": "done"},
+            {"action": "done", "ids": [1], "filter": {}},
+            {"action": "done", "ids": ["1"]},
+            {"action": "done", "ids": list(range(501))},
+            {"action": "done", "filter": {"status": "WAITING"}},
+            {"action": "done", "filter": {"visit_date": "yesterday"}},
+        ):
+            response = self.client.post(self.url, body, format="json")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, body
+
+    def test_non_object_bodies_are_rejected(self):
+        for body in ([self.in_room[0].pk], "done", 5):
+            response = self.client.post(self.url, body, format="json")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, body
+
+    def test_requires_doctor(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.assistant).key}"
+        )
+        response = self.client.post(
+            self.url, {"action": "done", "ids": [self.in_room[0].pk]}, format="json"
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class VisitQueryPlanTests(APITestCase):
+    """The display and doctor screens' visit queries must be index lookups."""
+
+    def setUp(self):
+        cache.clear()
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        display_group, _ = Group.objects.get_or_create(name="Display")
+        self.doctor = User.objects.create_user(username="plan_doctor", password="pass")
+        self.doctor.groups.add(doctor_group)
+        self.display = User.objects.create_user(username="plan_display", password="pass")
+        self.display.groups.add(display_group)
+        self.queue = Queue.objects.create(name="Plan Queue")
+        patient = Patient.objects.create(name="Plan Patient")
+        for token, status_value in enumerate(["DONE", "IN_ROOM", "START", "WAITING"], start=1):
+            Visit.objects.create(
+                patient=patient, queue=self.queue, token_number=token, status=status_value
+            )
+
+    def _visit_table_scans(self, user, method, url, params=None):
+        """Return the plans of ``url``'s visit queries that do not seek into the visit table.
+
+        Walking a whole index (SQLite's ``SCAN ... USING INDEX``) counts as a scan.
+        """
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, params)
+        assert response.status_code == status.HTTP_200_OK
+        selects = [
+            query["sql"]
+            for query in captured.captured_queries
+            if query["sql"].startswith("SELECT") and 'FROM "api_visit"' in query["sql"]
+        ]
+        assert selects
+
+        scans = []
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # The test tables are tiny, so only a missing index forces a scan.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                explain = "EXPLAIN "
+                table_scan = re.compile(r"Seq Scan on api_visit\b")
+                seek = re.compile(r"Index (Only )?Scan .*\bon api_visit\b|Bitmap Index Scan")
+            else:
+                explain = "EXPLAIN QUERY PLAN "
+                table_scan = re.compile(r"\bSCAN api_visit\b")
+                seek = re.compile(r"\bSEARCH api_visit\b")
+            for sql in selects:
+                cursor.execute(explain + sql)
+                plan = "\n".join(str(row[-1]) for row in cursor.fetchall())
+                if table_scan.search(plan) or not seek.search(plan):
+                    scans.append(plan)
+        return scans
+
+    def test_display_queries_use_indexes(self):
+        url = reverse("visit-list")
+        assert (
+            self._visit_table_scans(
+                self.display, "get", url, {"status": "WAITING", "queue": self.queue.pk}
+            )
+            == []
+        )
+        board = reverse("queue-board", kwargs={"pk": self.queue.pk})
+        assert self._visit_table_scans(self.display, "get", board) == []
+
+    def test_doctor_queries_use_indexes(self):
+        url = reverse("visit-list")
+        for params in (
+            {"status": "WAITING"},
+            {"status": "START,IN_ROOM"},
+            {"status": "START,IN_ROOM", "queue": self.queue.pk},
+            {"status": "WAITING,START,IN_ROOM", "queue": self.queue.pk},
+        ):
+            assert self._visit_table_scans(self.doctor, "get", url, params) == []
+        call_next = reverse("queue-call-next", kwargs={"pk": self.queue.pk})
+        assert self._visit_table_scans(self.doctor, "post", call_next) == []
+
+    def test_live_queue_partial_index_is_postgresql_only(self):
+        with connection.cursor() as cursor:
+            indexes = set(connection.introspection.get_constraints(cursor, "api_visit"))
+        assert "api_visit_status_idx" in indexes
+        assert ("api_visit_active_idx" in indexes) == (connection.vendor == "postgresql")
+
+
 @pytest.mark.django_db
 class GoogleDriveIntegrationTests(APITestCase):
     """Test Google Drive integration with prescription upload."""
@@ -0,0 +1,172 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.urls import reverse
+from freezegun import freeze_time
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .events import broker, stream_visit_events
+from .models import Patient, Queue, Visit
+from .views import STREAM_TICKET_MAX_AGE
+
+
+def test_broker_delivers_only_to_matching_queue():
+    async def run():
+        first = broker.subscribe(1)
+        second = broker.subscribe(2)
+        try:
+            broker.publish({"queue": 1, "id": 10, "status": "START"})
+            payload = await asyncio.wait_for(first.get(), 1)
+            await asyncio.sleep(0)
+            return payload, second.empty()
+        finally:
+            broker.unsubscribe(first)
+            broker.unsubscribe(second)
+
+    payload, other_queue_empty = async_to_sync(run)()
+    assert payload == {"queue": 1, "id": 10, "status": "START"}
+    assert other_queue_empty
+
+
+def test_stream_frames_published_changes():
+    async def run():
+        stream = stream_visit_events(5)
+        try:
+            retry = await stream.__anext__()
+            broker.publish({"queue": 5, "id": 1, "status": "WAITING"})
+            frame = await asyncio.wait_for(stream.__anext__(), 1)
+        finally:
+            await stream.aclose()
+        return retry, frame
+
+    retry, frame = async_to_sync(run)()
+    assert retry.startswith("retry:")
+    assert frame.startswith("event: visit\n")
+    data = frame.split("data: ", 1)[1].strip()
+    assert json.loads(data) == {"queue": 5, "id": 1, "status": "WAITING"}
+
+
+@pytest.mark.django_db
+class QueueEventStreamTests(APITestCase):
+    def setUp(self):
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        assistant_group, _ = Group.objects.get_or_create(name="Assistant")
+        user = User.objects.create_user(username="events", password="pass")
+        user.groups.add(doctor_group, assistant_group)
+        self.token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.patient = Patient.objects.create(name="Event Patient")
+        self.queue = Queue.objects.create(name="Event Queue")
+
+    def test_stream_requires_authentication(self):
+        url = reverse("queue-events", kwargs={"pk": self.queue.pk})
+        response = self.client_class().get(url)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def _ticket(self, queue=None):
+        url = reverse("queue-events-ticket", kwargs={"pk": (queue or self.queue).pk})
+        response = self.client.post(url)
+        assert response.status_code == status.HTTP_200_OK
+        return response.data["ticket"]
+
+    def test_stream_rejects_unknown_queue(self):
+        url = reverse("queue-events", kwargs={"pk": self.queue.pk + 100})
+        response = self.client_class().get(url, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_stream_is_refused_under_wsgi(self):
+        url = reverse("queue-events", kwargs={"pk": self.queue.pk})
+        response = self.client_class().get(url, {"ticket": self._ticket()})
+        assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+        assert "ASGI" in response.json()["detail"]
+
+    def test_stream_does_not_accept_the_api_token_in_the_url(self):
+        url = reverse("queue-events", kwargs={"pk": self.queue.pk})
+        response = self.client_class().get(url, {"token": self.token.key})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_ticket_only_opens_its_own_queue_while_fresh(self):
+        other_queue = Queue.objects.create(name="Other Event Queue")
+        url = reverse("queue-events", kwargs={"pk": other_queue.pk})
+        response = self.client_class().get(url, {"ticket": self._ticket()})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        with freeze_time() as frozen:
+            ticket = self._ticket()
+            frozen.tick(STREAM_TICKET_MAX_AGE + 1)
+            url = reverse("queue-events", kwargs={"pk": self.queue.pk})
+            response = self.client_class().get(url, {"ticket": ticket})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_stream_accepts_ticket_query_parameter(self):
+        url = reverse("queue-events", kwargs={"pk": self.queue.pk})
+        ticket = self._ticket()
+
+        async def run():
+            response = await self.async_client.get(url, {"ticket": ticket})
+            content = response.streaming_content
+            first = await content.__anext__()
+            await content.aclose()
+            return response, first
+
+        response, first = async_to_sync(run)()
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/event-stream"
+        assert first.startswith(b"retry:")
+
+    def test_visit_create_and_transition_publish_changes(self):
+        with mock.patch("api.views.publish_visit_change") as publish:
+            response = self.client.post(
+                reverse("visit-list"),
+                {"patient": self.patient.registration_number, "queue": self.queue.pk},
+                format="json",
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+            visit = Visit.objects.get(pk=response.data["id"])
+            self.client.patch(reverse("visit-start", kwargs={"pk": visit.pk}))
+
+        published = [call.args[0] for call in publish.call_args_list]
+        assert [v.pk for v in published] == [visit.pk, visit.pk]
+        assert [v.status for v in published] == ["WAITING", "START"]
+
+    def test_transition_reaches_broker_after_commit(self):
+        visit = Visit.objects.create(patient=self.patient, queue=self.queue, token_number=1)
+
+        with mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(reverse("visit-start", kwargs={"pk": visit.pk}))
+
+        publish.assert_called_once_with(
+            {
+                "id": visit.pk,
+                "queue": self.queue.pk,
+                "token_number": 1,
+                "visit_date": str(visit.visit_date),
+                "status": "START",
+            }
+        )
+
+    def test_move_and_delete_publish_removal_from_the_old_queue(self):
+        visit = Visit.objects.create(patient=self.patient, queue=self.queue, token_number=1)
+        other_queue = Queue.objects.create(name="Other Event Queue")
+        url = reverse("visit-detail", kwargs={"pk": visit.pk})
+
+        with mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, {"queue": other_queue.pk}, format="json")
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(url)
+
+        published = [call.args[0] for call in publish.call_args_list]
+        assert [(p["queue"], p.get("removed", False)) for p in published] == [
+            (self.queue.pk, True),
+            (other_queue.pk, False),
+            (other_queue.pk, True),
+        ]
+        assert {p["id"] for p in published} == {visit.pk}
@@ -251,3 +251,98 @@ def test_0002_schema_migration_creates_indexes_and_unique_constraint(migrator):
         "Unique constraint ('token_number', 'visit_date', 'queue') "
         "not found on Visit model after migration 0002"
     )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_0012_seeds_token_counters_from_existing_visits(migrator):
+    """Counters start at the highest token already issued per queue and day."""
+    old_state = migrator.apply_initial_migration(
+        ("api", "0011_delete_registrationnumberformat_patient_category")
+    )
+    OldPatient = old_state.apps.get_model("api", "Patient")
+    OldQueue = old_state.apps.get_model("api", "Queue")
+    OldVisit = old_state.apps.get_model("api", "Visit")
+
+    patient = OldPatient.objects.create(registration_number="0125-01-0001", name="Seed")
+    queue = OldQueue.objects.create(name="Seed Queue")
+    for token in (1, 2, 5):
+        OldVisit.objects.create(
+            patient=patient, queue=queue, token_number=token, visit_date="2025-01-10"
+        )
+    OldVisit.objects.create(patient=patient, queue=queue, token_number=3, visit_date="2025-01-11")
+
+    new_state = migrator.apply_tested_migration(("api", "0012_visittokencounter"))
+    Counter = new_state.apps.get_model("api", "VisitTokenCounter")
+
+    counters = {str(c.visit_date): c.last_token for c in Counter.objects.filter(queue_id=queue.pk)}
+    assert counters == {"2025-01-10": 5, "2025-01-11": 3}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_0013_seeds_registration_sequences_from_existing_patients(migrator):
+    """Sequences start at the highest serial already issued per month and category."""
+    old_state = migrator.apply_initial_migration(("api", "0012_visittokencounter"))
+    OldPatient = old_state.apps.get_model("api", "Patient")
+
+    for number in ("0125-01-0001", "0125-01-0007", "0125-02-0003", "0225-01-0002"):
+        OldPatient.objects.create(registration_number=number, name=number)
+
+    new_state = migrator.apply_tested_migration(("api", "0013_registrationsequence"))
+    Sequence = new_state.apps.get_model("api", "RegistrationSequence")
+
+    sequences = {(s.period, s.category): s.last_serial for s in Sequence.objects.all()}
+    assert sequences == {("0125", "01"): 7, ("0125", "02"): 3, ("0225", "01"): 2}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_0014_indexes_existing_patients_for_search(migrator):
+    """Patients created before the search index exist are searchable after it."""
+    from api.search import name_or_phone_contains
+
+    old_state = migrator.apply_initial_migration(("api", "0013_registrationsequence"))
+    OldPatient = old_state.apps.get_model("api", "Patient")
+    OldPatient.objects.create(registration_number="0125-01-0001", name="Alice Wonderland")
+    OldPatient.objects.create(registration_number="0125-01-0002", name="Bob", phone="0300123")
+
+    new_state = migrator.apply_tested_migration(("api", "0014_patient_search_index"))
+    NewPatient = new_state.apps.get_model("api", "Patient")
+
+    matches = NewPatient.objects.filter(name_or_phone_contains("wonder"))
+    assert list(matches.values_list("registration_number", flat=True)) == ["0125-01-0001"]
+    matches = NewPatient.objects.filter(name_or_phone_contains("0123"))
+    assert list(matches.values_list("registration_number", flat=True)) == ["0125-01-0002"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_0015_backfills_phone_digits(migrator):
+    """Existing phone numbers get their normalized and reversed digits."""
+    old_state = migrator.apply_initial_migration(("api", "0014_patient_search_index"))
+    OldPatient = old_state.apps.get_model("api", "Patient")
+    OldPatient.objects.create(registration_number="0125-01-0001", name="A", phone="+92 300-12")
+    OldPatient.objects.create(registration_number="0125-01-0002", name="B", phone="n/a")
+    OldPatient.objects.create(registration_number="0125-01-0003", name="C")
+
+    new_state = migrator.apply_tested_migration(("api", "0015_patient_phone_digits"))
+    NewPatient = new_state.apps.get_model("api", "Patient")
+
+    rows = NewPatient.objects.order_by("registration_number").values_list(
+        "phone_digits", "phone_digits_reversed"
+    )
+    assert list(rows) == [("9230012", "2100329"), (None, None), (None, None)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_0016_backfills_name_phonetic(migrator):
+    """Existing patients get the phonetic key of their name."""
+    old_state = migrator.apply_initial_migration(("api", "0015_patient_phone_digits"))
+    OldPatient = old_state.apps.get_model("api", "Patient")
+    OldPatient.objects.create(registration_number="0125-01-0001", name="Mohd Ali")
+    OldPatient.objects.create(registration_number="0125-01-0002", name="Aisha")
+
+    new_state = migrator.apply_tested_migration(("api", "0016_patient_name_phonetic"))
+    NewPatient = new_state.apps.get_model("api", "Patient")
+
+    keys = NewPatient.objects.order_by("registration_number").values_list(
+        "name_phonetic", flat=True
+    )
+    assert list(keys) == ["mhmd al", "ax"]
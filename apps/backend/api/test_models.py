@@ -3,7 +3,7 @@ from datetime import date, timedelta
 from freezegun import freeze_time
 from django.db import IntegrityError
 
-from api.models import Visit, Patient, Queue  # Added Patient, Queue
+from api.models import Visit, Patient, Queue, VisitTokenCounter  # Added Patient, Queue
 from api.serializers import (
     VisitSerializer,
 )  # VisitSerializer may not be used as much here now
@@ -20,6 +20,53 @@ class TestPatientModel:
         assert patient.gender == "OTHER"
         assert patient.phone is None  # Optional field
 
+    def test_patient_save_maintains_phone_digits(self):
+        patient = Patient.objects.create(name="Phone Owner", phone="+92 300-1234567")
+        assert patient.phone_digits == "923001234567"
+        assert patient.phone_digits_reversed == "765432100329"
+
+        patient.phone = "(042) 555"
+        patient.save(update_fields=["phone"])
+        patient.refresh_from_db()
+        assert patient.phone_digits == "042555"
+        assert patient.phone_digits_reversed == "555240"
+
+        patient.phone = ""
+        patient.save()
+        assert patient.phone_digits is None
+        assert patient.phone_digits_reversed is None
+
+    def test_patient_save_maintains_name_phonetic(self):
+        patient = Patient.objects.create(name="Mohammad Ali")
+        assert patient.name_phonetic == "mhmd al"
+
+        patient.name = "Ayesha"
+        patient.save(update_fields=["name"])
+        patient.refresh_from_db()
+        assert patient.name_phonetic == "ax"
+
+
+@pytest.mark.django_db
+class TestVisitTokenCounter:
+    def test_next_token_counts_up_per_queue_and_day(self):
+        queue1 = Queue.objects.create(name="Counter A")
+        queue2 = Queue.objects.create(name="Counter B")
+        today = date.today()
+
+        assert VisitTokenCounter.next_token(queue1, today) == 1
+        assert VisitTokenCounter.next_token(queue1, today) == 2
+        assert VisitTokenCounter.next_token(queue2, today) == 1
+        assert VisitTokenCounter.next_token(queue1, today + timedelta(days=1)) == 1
+        assert VisitTokenCounter.objects.get(queue=queue1, visit_date=today).last_token == 2
+
+    def test_next_token_seeds_from_existing_visits(self):
+        """Visits written before the counter row existed are not re-issued."""
+        patient = Patient.objects.create(name="Legacy Token")
+        queue = Queue.objects.create(name="Counter Legacy")
+        Visit.objects.create(patient=patient, queue=queue, token_number=7)
+
+        assert VisitTokenCounter.next_token(queue, date.today()) == 8
+
 
 @pytest.mark.django_db
 class TestQueueModel:
@@ -0,0 +1,35 @@
+import pytest
+
+from api.phonetics import phonetic_key
+
+
+@pytest.mark.parametrize(
+    "variants",
+    [
+        ("Muhammad", "Mohammad", "Mohammed", "Mohd"),
+        ("Ayesha", "Aisha"),
+        ("Hassan", "Hasan"),
+        ("Yousuf", "Yusuf", "Yousaf"),
+        ("Khadija", "Kadija", "Khadeeja"),
+        ("Qureshi", "Kureshi"),
+        ("Usman", "Osman"),
+        ("Sara", "Sarah"),
+    ],
+)
+def test_spelling_variants_share_a_key(variants):
+    assert len({phonetic_key(name) for name in variants}) == 1
+
+
+def test_distinct_names_keep_distinct_keys():
+    keys = [phonetic_key(name) for name in ("Fatima", "Zainab", "Hassan", "Ahmed")]
+    assert len(set(keys)) == len(keys)
+
+
+def test_key_covers_every_word():
+    assert phonetic_key("Mohd.  Ali-Khan") == phonetic_key("muhammad ali khan") == "mhmd al kn"
+
+
+def test_names_without_letters_have_no_key():
+    assert phonetic_key("") is None
+    assert phonetic_key(None) is None
+    assert phonetic_key("12-34") is None
@@ -5,6 +5,8 @@ from .views import (
     PatientViewSet,
     QueueViewSet,
     PrescriptionImageViewSet,
+    queue_analytics,
+    queue_events,
     me,
     health,
 )
@@ -23,6 +25,8 @@ router.register(
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("queues/<int:pk>/events/", queue_events, name="queue-events"),
+    path("analytics/queues/", queue_analytics, name="queue-analytics"),
     path("auth/me/", me, name="auth-me"),
     path("health/", health, name="health"),
     # The patient search endpoint is registered as an action within
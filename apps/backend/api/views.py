@@ -2,14 +2,31 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.utils.encoders import JSONEncoder
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.core.cache import cache
-from django.db.models import Q  # For complex lookups (patient search)
+from django.db import transaction
+from django.db.models import (  # Q for complex lookups (patient search)
+    Count,
+    Max,
+    Prefetch,
+    Q,
+    Subquery,
+    Value,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+import copy
 import datetime  # Required for date operations
+import hashlib
+import json
 import logging
 import re  # For registration number pattern matching
 
@@ -18,17 +35,42 @@ from .models import (
     Patient,
     Queue,
     PrescriptionImage,
+    QueueDailyStats,
+    VisitEvent,
+    VisitTokenCounter,
 )
 from .serializers import (
     VisitSerializer,
-    VisitStatusSerializer,
     PatientSerializer,
     QueueSerializer,
     PrescriptionImageSerializer,
+    recent_visits_prefetch,
+)
+from .pagination import (
+    KeysetPaginationMixin,
+    PatientKeysetPagination,
+    StandardResultsSetPagination,
+    VisitKeysetPagination,
+)
+from .board import get_queue_board, invalidate_patient_boards, invalidate_queue_board
+from .caching import cache_response, get_namespace_versions, invalidate_namespaces
+from .events import (
+    ensure_listener,
+    publish_visit_change,
+    publish_visit_removal,
+    stream_visit_events,
 )
-from .pagination import StandardResultsSetPagination
 from .google_drive import upload_prescription_image
 from .permissions import IsDoctor, IsAssistant, IsDisplay
+from .rollups import ROLLUP_PERIODS, queue_stats
+from .search import (
+    autocomplete_patients,
+    name_or_phone_contains,
+    name_sounds_like,
+    order_by_relevance,
+    phone_ends_with,
+)
+from .waittime import SERVICE_TIME_NAMESPACE, record_service_times
 
 logger = logging.getLogger(__name__)
 
@@ -67,8 +109,119 @@ def health(request):
     )
 
 
-@method_decorator(cache_page(60 * 5), name="list")
-@method_decorator(cache_page(60 * 5), name="retrieve")
+def _date_param(request, name, default):
+    raw = request.query_params.get(name)
+    if not raw:
+        return default
+    try:
+        return datetime.date.fromisoformat(raw)
+    except ValueError:
+        raise ValidationError({name: "Must be a YYYY-MM-DD date."})
+
+
+@api_view(["GET"])
+@permission_classes([IsDoctor])
+def queue_analytics(request):
+    """
+    Visit totals, average wait and service times and category mix per queue,
+    read from the daily rollup tables.
+    Usage: GET /api/analytics/queues/?since=<date>&until=<date>&period=<day|month|year>&queue=<id>
+    Defaults to the last 30 days, per day, for every queue.
+    """
+    until = _date_param(request, "until", timezone.now().date())
+    since = _date_param(request, "since", until - datetime.timedelta(days=29))
+    period = request.query_params.get("period", "day")
+    if period not in ROLLUP_PERIODS:
+        raise ValidationError({"period": f"Must be one of: {', '.join(ROLLUP_PERIODS)}."})
+    queue_id = request.query_params.get("queue")
+    if queue_id is not None and not queue_id.isdigit():
+        raise ValidationError({"queue": "Must be a queue ID."})
+
+    results = queue_stats(since, until, period, int(queue_id) if queue_id else None)
+    return Response(
+        {
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "period": period,
+            "results": results,
+        }
+    )
+
+
+# Seconds a stream ticket stays valid. It only has to outlive the time
+# between fetching it and opening (or reopening) the stream.
+STREAM_TICKET_MAX_AGE = 60
+STREAM_TICKET_SALT = "api.queue-events"
+
+
+def make_stream_ticket(user, queue_id):
+    """Return a signed, short-lived ticket letting ``user`` open ``queue_id``'s stream."""
+    return signing.dumps({"user": user.pk, "queue": int(queue_id)}, salt=STREAM_TICKET_SALT)
+
+
+def _authenticate_event_stream(request, pk):
+    """Resolve the user for an event stream request on queue ``pk``.
+
+    Browsers' EventSource cannot send an Authorization header, so they pass
+    a ticket from ``POST /api/queues/<id>/events/ticket/`` as ``?ticket=``
+    instead. Unlike the API token, a ticket that ends up in an access log
+    expires within ``STREAM_TICKET_MAX_AGE`` seconds and only opens one
+    queue's stream. Token headers and sessions are accepted as elsewhere.
+    """
+    ticket = request.GET.get("ticket")
+    if ticket:
+        try:
+            claims = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        if claims.get("queue") != int(pk):
+            return None
+        return get_user_model().objects.filter(pk=claims.get("user"), is_active=True).first()
+    auth = get_authorization_header(request).split()
+    if len(auth) == 2 and auth[0].lower() == b"token":
+        try:
+            user, _ = TokenAuthentication().authenticate_credentials(auth[1].decode())
+        except AuthenticationFailed:
+            return None
+        return user
+    return request.user if request.user.is_authenticated else None
+
+
+async def queue_events(request, pk):
+    """
+    Stream visit status changes for a queue as server-sent events.
+    Usage: GET /api/queues/<id>/events/?ticket=<ticket>
+    Each change is sent as an ``event: visit`` frame whose data holds the
+    visit id, queue, token number, visit date and new status.
+    """
+    user = await sync_to_async(_authenticate_event_stream)(request, pk)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    if not await Queue.objects.filter(pk=pk).aexists():
+        return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    # Under WSGI the endless stream would hold a worker until the client leaves.
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The event stream is only served by the ASGI application."},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    ensure_listener()
+    response = StreamingHttpResponse(stream_visit_events(pk), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop reverse proxies from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# Cached queue list and detail responses depend on this namespace. Queues
+# are only edited through the admin, so entries simply age out.
+QUEUE_NAMESPACE = "queues"
+
+
 class QueueViewSet(viewsets.ReadOnlyModelViewSet):
     """API endpoint that allows queues to be viewed."""
 
@@ -76,15 +229,92 @@ class QueueViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = QueueSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @cache_response(lambda view, request, kwargs: [QUEUE_NAMESPACE])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(lambda view, request, kwargs: [QUEUE_NAMESPACE])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-@method_decorator(cache_page(60 * 5), name="list")
-@method_decorator(cache_page(60 * 5), name="retrieve")
-class PatientViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=["get"])
+    def board(self, request, pk=None):
+        """
+        Today's public display board for one queue.
+        Usage: GET /api/queues/<id>/board/
+        Returns the in-room and waiting visits in token order with patient
+        names and positions, served from cache until a visit in the queue
+        changes.
+        """
+        return Response(get_queue_board(self.get_object()))
+
+    @action(detail=True, methods=["post"], url_path="events/ticket")
+    def events_ticket(self, request, pk=None):
+        """
+        Issue a short-lived ticket for this queue's event stream.
+        Usage: POST /api/queues/<id>/events/ticket/
+        Pass the returned ticket to GET /api/queues/<id>/events/?ticket=...
+        """
+        queue = self.get_object()
+        return Response(
+            {
+                "ticket": make_stream_ticket(request.user, queue.pk),
+                "expires_in": STREAM_TICKET_MAX_AGE,
+            }
+        )
+
+    @action(detail=True, methods=["post"], url_path="call-next", permission_classes=[IsDoctor])
+    def call_next(self, request, pk=None):
+        """
+        Call the next patient: claim today's lowest-token WAITING visit in
+        this queue and move it to START.
+        Usage: POST /api/queues/<id>/call-next/
+        Doctors sharing a queue each get a different visit. Returns 404
+        when nobody is waiting.
+        """
+        queue = self.get_object()
+        visit = Visit.claim_next(queue, timezone.now().date())
+        if visit is None:
+            return Response(
+                {"detail": "No patients are waiting in this queue."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        publish_visit_change(visit)
+        invalidate_queue_board(visit)
+        logger.info(
+            f"Visit {visit.id} (Token {visit.token_number}) called in queue {queue.name} "
+            f"by user {request.user.username}"
+        )
+        return Response(VisitSerializer(visit, context={"request": request}).data)
+
+
+# Cached patient list and search responses all depend on this namespace;
+# each patient's detail response depends on its own patient_namespace().
+PATIENT_LIST_NAMESPACE = "patients"
+# Autocomplete rows carry no visit data, so only patient writes bump this
+# one and visit writes leave the per-keystroke responses cached.
+PATIENT_AUTOCOMPLETE_NAMESPACE = "patient-autocomplete"
+
+
+def patient_namespace(registration_number):
+    return f"patient:{registration_number}"
+
+
+class PatientViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     """API endpoint that allows patients to be viewed or edited."""
 
+    # Row limits for the autocomplete action (?limit=)
+    autocomplete_default_limit = 10
+    autocomplete_max_limit = 25
+    # Registration numbers accepted per bulk lookup, and fetched per IN query
+    bulk_lookup_limit = 5000
+    bulk_batch_size = 500
+
     queryset = Patient.objects.all().order_by("registration_number")
     serializer_class = PatientSerializer
     pagination_class = StandardResultsSetPagination
+    # ?cursor= switches list to keyset pagination (see pagination.py)
+    keyset_pagination_class = PatientKeysetPagination
     # Use registration_number for single patient lookups
     lookup_field = "registration_number"
     permission_classes = [permissions.IsAuthenticated]
@@ -99,8 +329,9 @@ class PatientViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Optionally filter patients by a comma-separated list of
         registration numbers.
+        Each patient's last five visit dates are prefetched in one query.
         """
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().prefetch_related(recent_visits_prefetch())
         pattern = re.compile(r"^\d{4}-\d{2}-\d{4}$")
         reg_nums = self.request.query_params.get("registration_numbers")
         if reg_nums:
@@ -132,22 +363,37 @@ class PatientViewSet(viewsets.ModelViewSet):
                 return Patient.objects.none()
         return queryset
 
+    @cache_response(lambda view, request, kwargs: [PATIENT_LIST_NAMESPACE])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(
+        lambda view, request, kwargs: [patient_namespace(kwargs["registration_number"])]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        cache.clear()
         patient = serializer.save()
+        invalidate_namespaces(PATIENT_LIST_NAMESPACE, PATIENT_AUTOCOMPLETE_NAMESPACE)
         logger.info(
             f"Patient created: {patient.registration_number} ({patient.name}) "
             f"by user {self.request.user.username}"
         )
 
     def perform_update(self, serializer):
-        cache.clear()
         old_data = {
-            "name": self.get_object().name,
-            "phone": self.get_object().phone,
-            "gender": self.get_object().gender,
+            "name": serializer.instance.name,
+            "phone": serializer.instance.phone,
+            "gender": serializer.instance.gender,
         }
         patient = serializer.save()
+        invalidate_namespaces(
+            PATIENT_LIST_NAMESPACE,
+            PATIENT_AUTOCOMPLETE_NAMESPACE,
+            patient_namespace(patient.registration_number),
+        )
+        invalidate_patient_boards(patient)
         logger.info(
             f"Patient updated: {patient.registration_number} "
             f"by user {self.request.user.username}. "
@@ -157,19 +403,25 @@ class PatientViewSet(viewsets.ModelViewSet):
         )
 
     def perform_destroy(self, instance):
-        cache.clear()
+        invalidate_namespaces(
+            PATIENT_LIST_NAMESPACE,
+            PATIENT_AUTOCOMPLETE_NAMESPACE,
+            patient_namespace(instance.registration_number),
+        )
+        invalidate_patient_boards(instance)
         logger.warning(
             f"Patient deleted: {instance.registration_number} ({instance.name}) "
             f"by user {self.request.user.username}"
         )
         return super().perform_destroy(instance)
 
-    @method_decorator(cache_page(60 * 5))
     @action(detail=False, methods=["get"], url_path="search")
+    @cache_response(lambda view, request, kwargs: [PATIENT_LIST_NAMESPACE])
     def search(self, request):
         """
         Search for patients by registration number,
         name fragment, or phone fragment.
+        Results are ordered by relevance (see search.order_by_relevance).
         Usage: GET /api/patients/search/?q=<query_term>
         """
         query = request.query_params.get("q", None)
@@ -181,11 +433,15 @@ class PatientViewSet(viewsets.ModelViewSet):
 
         # Build Q objects for searching
         # registration_number: exact match (if query matches format or is numeric)
-        # name: case-insensitive contains
-        # phone: case-insensitive contains
-        # (searches for part of a phone number)
+        # name, phone: case-insensitive substring match, served by the
+        # trigram search index (see api/search.py)
+        # phone digits: suffix match ignoring formatting, for digit queries
+        # name_phonetic: spelling variants of the name's leading words
 
-        filters = Q(name__icontains=query) | Q(phone__icontains=query)
+        filters = name_or_phone_contains(query)
+        for extra in (phone_ends_with(query), name_sounds_like(query)):
+            if extra is not None:
+                filters |= extra
 
         pattern = re.compile(r"^\d{4}-\d{2}-\d{4}$")
 
@@ -193,7 +449,9 @@ class PatientViewSet(viewsets.ModelViewSet):
         if pattern.match(query):
             filters |= Q(registration_number=query)
 
-        patients = Patient.objects.filter(filters).order_by("registration_number")
+        patients = order_by_relevance(
+            Patient.objects.filter(filters).prefetch_related(recent_visits_prefetch()), query
+        )
 
         # Paginate results if pagination is configured globally,
         # otherwise return all
@@ -205,17 +463,139 @@ class PatientViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(patients, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Look up many patients by registration number in one request.
+        Body: {"registration_numbers": ["mmyy-ct-0000", ...]}
+        The response is streamed as {"results": [...]}, ordered by
+        registration number and fetched in batches of IN queries.
+        Unknown or malformed numbers are left out.
+        """
+        numbers = request.data.get("registration_numbers") if hasattr(request.data, "get") else None
+        if not isinstance(numbers, list):
+            raise ValidationError(
+                {"registration_numbers": "Expected a list of registration numbers."}
+            )
+        if len(numbers) > self.bulk_lookup_limit:
+            raise ValidationError(
+                {
+                    "registration_numbers": f"A maximum of {self.bulk_lookup_limit} "
+                    "registration numbers are allowed."
+                }
+            )
+
+        pattern = re.compile(r"^\d{4}-\d{2}-\d{4}$")
+        valid = sorted({num for num in numbers if isinstance(num, str) and pattern.match(num)})
+        return StreamingHttpResponse(
+            self._stream_bulk_patients(valid), content_type="application/json"
+        )
+
+    async def _stream_bulk_patients(self, numbers):
+        # An async generator lets the ASGI handler send each batch as it is
+        # serialized; it would read a sync generator to the end first.
+        yield '{"results":['
+        separator = ""
+        for start in range(0, len(numbers), self.bulk_batch_size):
+            rows = await sync_to_async(self._bulk_patient_rows)(
+                numbers[start : start + self.bulk_batch_size]
+            )
+            if rows:
+                yield separator + ",".join(json.dumps(row, cls=JSONEncoder) for row in rows)
+                separator = ","
+        yield "]}"
+
+    def _bulk_patient_rows(self, numbers):
+        patients = (
+            Patient.objects.filter(registration_number__in=numbers)
+            .prefetch_related(recent_visits_prefetch())
+            .order_by("registration_number")
+        )
+        return self.get_serializer(patients, many=True).data
 
-class VisitViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["get"], url_path="autocomplete")
+    @cache_response(lambda view, request, kwargs: [PATIENT_AUTOCOMPLETE_NAMESPACE])
+    def autocomplete(self, request):
+        """
+        Suggest patients as a query is typed.
+        Matches registration number prefixes, phone-number endings and
+        name prefixes, and returns at most ``limit`` minimal rows without
+        a count or visit history.
+        Usage: GET /api/patients/autocomplete/?q=<prefix>&limit=<n>
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(
+                {"error": "Query parameter 'q' is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        raw_limit = request.query_params.get("limit", self.autocomplete_default_limit)
+        try:
+            limit = int(raw_limit)
+        except (TypeError, ValueError):
+            raise ValidationError({"limit": "Must be a whole number."})
+        if not 1 <= limit <= self.autocomplete_max_limit:
+            raise ValidationError(
+                {"limit": f"Must be between 1 and {self.autocomplete_max_limit}."}
+            )
+
+        rows = autocomplete_patients(Patient.objects.all(), query, limit)
+        return Response({"results": rows})
+
+
+def _stamp(queryset, aggregate):
+    """Return ``aggregate`` over all of ``queryset`` as a scalar subquery.
+
+    ``aggregate()`` only accepts aggregates, so the subquery is wrapped in
+    ``Max``. It does not refer to the outer query, so it runs once.
+    """
+    values = queryset.order_by().values(all=Value(1)).annotate(value=aggregate).values("value")
+    return Max(Subquery(values))
+
+
+class VisitViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Visit.objects.all()
     serializer_class = VisitSerializer
     pagination_class = StandardResultsSetPagination
+    # ?cursor= switches list to keyset pagination (see pagination.py)
+    keyset_pagination_class = VisitKeysetPagination
     permission_classes = [permissions.IsAuthenticated]
+    # Related data that can be embedded with ?expand=patient,prescriptions
+    expandable = ("patient", "prescriptions")
+    # Status actions: action name -> (new status, statuses it may move from)
+    status_transitions = {
+        "start": ("START", ["WAITING"]),
+        "in_room": ("IN_ROOM", ["START"]),
+        "send_back_to_waiting": ("WAITING", ["START", "IN_ROOM"]),
+        "done": ("DONE", ["IN_ROOM"]),
+    }
+    # Visit IDs accepted per bulk transition request
+    bulk_transition_limit = 500
+
+    def get_expand(self):
+        """Return the validated set of requested ``expand`` options."""
+        raw = self.request.query_params.get("expand", "")
+        requested = {option.strip().lower() for option in raw.split(",") if option.strip()}
+        unknown = requested - set(self.expandable)
+        if unknown:
+            raise ValidationError(
+                {
+                    "expand": f"Unsupported option(s): {', '.join(sorted(unknown))}. "
+                    f"Allowed: {', '.join(self.expandable)}."
+                }
+            )
+        return requested
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
 
     def get_permissions(self):
         if self.action == "create":
             permission_classes = [IsAssistant]
-        elif self.action in ["start", "in_room", "send_back_to_waiting", "done"]:
+        elif self.action in [*self.status_transitions, "bulk_transition"]:
             permission_classes = [IsDoctor]
         elif (
             self.action == "list"
@@ -250,41 +630,96 @@ class VisitViewSet(viewsets.ModelViewSet):
         if queue_id_param:
             queryset = queryset.filter(queue__id=queue_id_param)
 
+        expand = self.get_expand()
+        if "patient" in expand:
+            queryset = queryset.prefetch_related(recent_visits_prefetch("patient__visits"))
+        if "prescriptions" in expand:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "prescription_images",
+                    queryset=PrescriptionImage.objects.order_by("-created_at"),
+                )
+            )
+
         # Default ordering
         return queryset.order_by("visit_date", "queue__name", "token_number")
 
+    def list(self, request, *args, **kwargs):
+        """
+        List visits with conditional GET support.
+        The ETag is derived from the filtered set's row count and latest
+        update, so a poll whose If-None-Match still matches gets a 304
+        without running the page query or the serializer.
+        Cursor pages (?cursor=) are for scrolling history rather than
+        polling, so they skip the ETag, whose aggregate reads every row of
+        the filtered set.
+        """
+        if self.uses_keyset_pagination():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        aggregates = {
+            "count": Count("id"),
+            "last_modified": Max("updated_at"),
+            "patient_modified": Max("patient__updated_at"),
+        }
+        # Expanded data is stamped from subqueries, not joins, so the
+        # aggregate reads each filtered visit once.
+        expand = self.get_expand()
+        if "patient" in expand:
+            # Embedded patients list their latest visits, in any queue.
+            patient_visits = Visit.objects.filter(patient__in=queryset.values("patient_id"))
+            aggregates["patient_visit_modified"] = _stamp(patient_visits, Max("updated_at"))
+        if "prescriptions" in expand:
+            images = PrescriptionImage.objects.filter(visit__in=queryset.values("pk"))
+            aggregates["prescription_count"] = _stamp(images, Count("id"))
+            aggregates["prescription_modified"] = _stamp(images, Max("created_at"))
+        stamp = queryset.aggregate(**aggregates)
+        # Waiting visits embed wait estimates, which follow the service-time models.
+        stamp.update(get_namespace_versions([SERVICE_TIME_NAMESPACE]))
+        fingerprint = "|".join(
+            [request.get_full_path()] + [f"{name}={value}" for name, value in stamp.items()]
+        )
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+
+        # Only the ETag is validated: a visit leaving a filtered set (e.g.
+        # WAITING -> START) changes the count but not the remaining rows'
+        # latest update, so If-Modified-Since alone would miss it.
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
+
     def perform_create(self, serializer):
         """
         Custom logic for creating a Visit:
-        - Auto-assign token_number (per queue, per day).
+        - Auto-assign token_number (per queue, per day) from the
+          queue's daily token counter.
         - Set visit_date to today.
         - Set status to 'WAITING'.
-        - Use database locking to prevent race conditions.
         """
-        from django.db import transaction
-
         today = datetime.date.today()
         queue_instance = serializer.validated_data["queue"]
 
-        # Use transaction with row-level locking to prevent race conditions
+        # The counter increment and the insert share one transaction so a
+        # failed insert does not burn a token.
         with transaction.atomic():
-            # Determine next token number for this specific queue and date with locking
-            last_visit_in_queue_today = (
-                Visit.objects.select_for_update()
-                .filter(queue=queue_instance, visit_date=today)
-                .order_by("-token_number")
-                .first()
-            )
-
-            next_token_number = 1
-            if last_visit_in_queue_today:
-                next_token_number = last_visit_in_queue_today.token_number + 1
+            next_token_number = VisitTokenCounter.next_token(queue_instance, today)
 
             visit = serializer.save(
                 token_number=next_token_number,
                 visit_date=today,
                 status="WAITING",
             )
+            VisitEvent.record(visit)
+            QueueDailyStats.record_created(visit)
+            publish_visit_change(visit)
+            invalidate_queue_board(visit)
+            # Patient list and detail responses show each patient's latest visit dates.
+            invalidate_namespaces(PATIENT_LIST_NAMESPACE, patient_namespace(visit.patient_id))
 
             logger.info(
                 f"Visit created: Token {visit.token_number} "
@@ -293,49 +728,186 @@ class VisitViewSet(viewsets.ModelViewSet):
                 f"by user {self.request.user.username}"
             )
 
-    def _update_status(self, request, pk, new_status, expected_current_statuses):
-        visit = self.get_object()
-        old_status = visit.status
+    def perform_update(self, serializer):
+        """
+        Edits may move a visit to another queue or patient, so the daily
+        rollups, boards and cached patient details on both sides are
+        refreshed.
+        """
+        previous = copy.copy(serializer.instance)
+        with transaction.atomic():
+            visit = serializer.save()
+            QueueDailyStats.record_moved(previous, visit)
+            if (previous.queue_id, previous.visit_date) != (visit.queue_id, visit.visit_date):
+                publish_visit_removal(previous)
+                invalidate_queue_board(previous)
+            publish_visit_change(visit)
+            invalidate_queue_board(visit)
+            invalidate_namespaces(
+                PATIENT_LIST_NAMESPACE,
+                patient_namespace(previous.patient_id),
+                patient_namespace(visit.patient_id),
+            )
+        logger.info(f"Visit {visit.id} updated by user {self.request.user.username}")
 
-        if visit.status not in expected_current_statuses:
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            QueueDailyStats.record_deleted(instance)
+            publish_visit_removal(instance)
+            invalidate_queue_board(instance)
+            invalidate_namespaces(PATIENT_LIST_NAMESPACE, patient_namespace(instance.patient_id))
             logger.warning(
-                f"Invalid status transition attempted: "
-                f"Visit {visit.id} (Token {visit.token_number}) "
-                f"from {old_status} to {new_status} "
-                f"by user {request.user.username}. "
-                f"Expected current status to be one of: {expected_current_statuses}"
-            )
-            return Response(
-                {
-                    "detail": f"Visit must be in one of the following "
-                    f"states: {', '.join(expected_current_statuses)}"
-                },
-                status=status.HTTP_400_BAD_REQUEST,
+                f"Visit deleted: Token {instance.token_number} "
+                f"in queue {instance.queue_id} on {instance.visit_date} "
+                f"by user {self.request.user.username}"
             )
+            super().perform_destroy(instance)
 
-        serializer = VisitStatusSerializer(visit, data={"status": new_status}, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            full_visit_serializer = VisitSerializer(visit, context={"request": request})
+    def _update_status(self, request, pk, new_status, expected_current_statuses):
+        """
+        Move a visit to ``new_status`` with one conditional UPDATE.
+        The row only changes if it is still in one of
+        ``expected_current_statuses``, so of two concurrent clicks exactly
+        one wins and the other gets 409 Conflict.
+        A move to DONE feeds the queue's service-time model (waittime.py).
+        """
+        with transaction.atomic():
+            updated = Visit.objects.filter(pk=pk, status__in=expected_current_statuses).update(
+                status=new_status, updated_at=timezone.now()
+            )
+            visit = get_object_or_404(Visit.objects.select_related("patient", "queue"), pk=pk)
+            if not updated:
+                logger.warning(
+                    f"Invalid status transition attempted: "
+                    f"Visit {visit.id} (Token {visit.token_number}) "
+                    f"from {visit.status} to {new_status} "
+                    f"by user {request.user.username}. "
+                    f"Expected current status to be one of: {expected_current_statuses}"
+                )
+                return Response(
+                    {
+                        "detail": f"Visit must be in one of the following "
+                        f"states: {', '.join(expected_current_statuses)}",
+                        "status": visit.status,
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+            VisitEvent.record(visit)
+            entered = QueueDailyStats.record_transition(new_status, visit)
+            if new_status == "DONE":
+                record_service_times(entered, visit)
+            publish_visit_change(visit)
+            invalidate_queue_board(visit)
 
-            return Response(full_visit_serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(VisitSerializer(visit, context={"request": request}).data)
 
     @action(detail=True, methods=["patch"])
     def start(self, request, pk=None):
-        return self._update_status(request, pk, "START", ["WAITING"])
+        return self._update_status(request, pk, *self.status_transitions["start"])
 
     @action(detail=True, methods=["patch"])
     def in_room(self, request, pk=None):
-        return self._update_status(request, pk, "IN_ROOM", ["START"])
+        return self._update_status(request, pk, *self.status_transitions["in_room"])
 
     @action(detail=True, methods=["patch"])
     def send_back_to_waiting(self, request, pk=None):
-        return self._update_status(request, pk, "WAITING", ["START", "IN_ROOM"])
+        return self._update_status(request, pk, *self.status_transitions["send_back_to_waiting"])
 
     @action(detail=True, methods=["patch"])
     def done(self, request, pk=None):
-        return self._update_status(request, pk, "DONE", ["IN_ROOM"])
+        return self._update_status(request, pk, *self.status_transitions["done"])
+
+    @action(detail=False, methods=["post"], url_path="bulk-transition")
+    def bulk_transition(self, request):
+        """
+        Apply one status action to many visits with a single UPDATE.
+        Body: {"action": "done", "ids": [1, 2, 3]}
+           or {"action": "done", "filter": {"queue": 1, "visit_date": "2025-10-31"}}
+        With a filter, every visit of that day (today by default) and
+        queue that the action can move is moved. The response reports an
+        outcome per visit: "updated", "conflict" (with its current status)
+        or "not_found".
+        """
+        if not isinstance(request.data, dict):
+            raise ValidationError({"detail": "Expected a JSON object."})
+        action_name = request.data.get("action")
+        if action_name not in self.status_transitions:
+            raise ValidationError(
+                {"action": f"Must be one of: {', '.join(self.status_transitions)}."}
+            )
+        new_status, expected_current_statuses = self.status_transitions[action_name]
+
+        ids = request.data.get("ids")
+        filters = request.data.get("filter")
+        if (ids is None) == (filters is None):
+            raise ValidationError({"detail": "Provide either 'ids' or 'filter'."})
+        if ids is not None:
+            ids = self._bulk_transition_ids(ids)
+            candidates = Visit.objects.filter(pk__in=ids)
+        else:
+            candidates = self._bulk_transition_filter(filters).filter(
+                status__in=expected_current_statuses
+            )
+
+        with transaction.atomic():
+            # Write before reading, as _update_status does; outcomes come
+            # from what the UPDATE changed, not from an earlier read.
+            moved = set(Visit.move_status(candidates, new_status, expected_current_statuses))
+            current = {
+                visit.pk: visit
+                for visit in Visit.objects.filter(pk__in=ids if ids is not None else moved)
+            }
+            visits = [visit for pk, visit in current.items() if pk in moved]
+            VisitEvent.record(*visits)
+            entered = QueueDailyStats.record_transition(new_status, *visits)
+            if new_status == "DONE":
+                record_service_times(entered, *visits)
+            publish_visit_change(*visits)
+            for visit in visits:
+                invalidate_queue_board(visit)
+
+        results = []
+        for pk in ids if ids is not None else sorted(moved):
+            if pk in moved:
+                results.append({"id": pk, "outcome": "updated"})
+            elif pk not in current:
+                results.append({"id": pk, "outcome": "not_found"})
+            else:
+                results.append({"id": pk, "outcome": "conflict", "status": current[pk].status})
+        updated = len(moved)
+        logger.info(
+            f"Bulk {action_name}: {updated} of {len(results)} visits moved to {new_status} "
+            f"by user {request.user.username}"
+        )
+        return Response({"updated": updated, "results": results})
+
+    def _bulk_transition_ids(self, ids):
+        if not isinstance(ids, list) or not all(
+            isinstance(pk, int) and not isinstance(pk, bool) for pk in ids
+        ):
+            raise ValidationError({"ids": "Expected a list of visit IDs."})
+        if len(ids) > self.bulk_transition_limit:
+            raise ValidationError(
+                {"ids": f"A maximum of {self.bulk_transition_limit} visit IDs are allowed."}
+            )
+        return list(dict.fromkeys(ids))
+
+    def _bulk_transition_filter(self, filters):
+        if not isinstance(filters, dict) or not set(filters) <= {"queue", "visit_date"}:
+            raise ValidationError({"filter": "Supported keys are 'queue' and 'visit_date'."})
+        try:
+            visit_date = datetime.date.fromisoformat(
+                filters.get("visit_date") or timezone.now().date().isoformat()
+            )
+        except (TypeError, ValueError):
+            raise ValidationError({"filter": "visit_date must be a YYYY-MM-DD date."})
+        queryset = Visit.objects.filter(visit_date=visit_date)
+        if "queue" in filters:
+            queue_id = filters["queue"]
+            if not isinstance(queue_id, int) or isinstance(queue_id, bool):
+                raise ValidationError({"filter": "queue must be a queue ID."})
+            queryset = queryset.filter(queue_id=queue_id)
+        return queryset
 
 
 class PrescriptionImageViewSet(viewsets.ModelViewSet):
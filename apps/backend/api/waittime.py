@@ -0,0 +1,92 @@
+"""Rolling per-queue service-time model for wait estimates.
+
+Each IN_ROOM -> DONE transition folds the visit's time in the room into an
+exponentially weighted moving average (EWMA) of service time, kept in the
+cache per queue. A waiting visit's estimated wait is then its position in
+the waiting line times that average, with no scan of past visits.
+
+Updates are a read-modify-write of one cache entry, so two visits finishing
+at the same instant may drop one sample; the average absorbs that.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .caching import bump_namespaces
+from .models import Visit
+
+# Weight of the newest sample. Higher values follow a change of pace faster.
+SERVICE_TIME_ALPHA = 0.2
+# Cached visit lists embed estimates, so their ETags include this namespace.
+SERVICE_TIME_NAMESPACE = "service-times"
+
+
+def service_time_key(queue_id):
+    return f"service-time:{queue_id}"
+
+
+def get_service_times(queue_ids):
+    """Return ``{queue_id: average service seconds}`` for queues with a model."""
+    keys = {service_time_key(queue_id): queue_id for queue_id in set(queue_ids)}
+    return {keys[key]: model["seconds"] for key, model in cache.get_many(keys).items()}
+
+
+def estimate_wait(service_seconds, position):
+    """Return the estimated wait in whole seconds for the ``position``-th waiting visit."""
+    if service_seconds is None:
+        return None
+    return round(service_seconds * position)
+
+
+def waiting_estimates(queue_id, visit_date):
+    """Return ``{visit_id: estimated wait seconds}`` for a queue's waiting visits.
+
+    Queues without a model yet return ``{}`` without querying visits.
+    """
+    service_seconds = get_service_times([queue_id]).get(queue_id)
+    if service_seconds is None:
+        return {}
+    waiting = (
+        Visit.objects.filter(queue_id=queue_id, visit_date=visit_date, status="WAITING")
+        .order_by("token_number")
+        .values_list("id", flat=True)
+    )
+    return {
+        visit_id: estimate_wait(service_seconds, position)
+        for position, visit_id in enumerate(waiting, start=1)
+    }
+
+
+def record_service_times(entered, *visits):
+    """Fold the room time of ``visits``, which just moved to DONE, into their queues' models.
+
+    The time in the room runs from each visit's latest IN_ROOM event, given
+    as ``entered`` (``VisitEvent.last_entered(visits, "IN_ROOM")``), to its
+    DONE update. The models are updated once the write commits.
+    """
+    samples = [
+        (visit.queue_id, (visit.updated_at - entered[visit.pk]).total_seconds())
+        for visit in visits
+        if visit.pk in entered
+    ]
+    if samples:
+        transaction.on_commit(lambda: _fold_samples(samples))
+
+
+def _fold_samples(samples):
+    keys = {service_time_key(queue_id) for queue_id, _ in samples}
+    models = cache.get_many(keys)
+    for queue_id, seconds in samples:
+        key = service_time_key(queue_id)
+        model = models.get(key)
+        if model is None:
+            model = {"seconds": seconds, "samples": 1}
+        else:
+            model = {
+                "seconds": SERVICE_TIME_ALPHA * seconds
+                + (1 - SERVICE_TIME_ALPHA) * model["seconds"],
+                "samples": model["samples"] + 1,
+            }
+        models[key] = model
+    cache.set_many(models, timeout=None)
+    bump_namespaces(SERVICE_TIME_NAMESPACE)
@@ -3,6 +3,10 @@ ASGI config for clinicq_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Deployments serve the project through this module with uvicorn. The live
+queue event stream at ``/api/queues/<id>/events/`` holds its connection open,
+so it is refused when the project runs under WSGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,181 @@
+"""SQLite-file cache backend shared by every worker process on a host.
+
+``LocMemCache`` gives each gunicorn worker its own private cache, so an
+invalidation made by one worker never reaches the others. This backend
+keeps entries in a single SQLite file in WAL mode instead, which every
+worker opens. All workers see one coherent cache, and no external cache
+service is needed.
+
+Writes that must be atomic across processes (``add`` and ``incr``) run
+inside ``BEGIN IMMEDIATE`` transactions, which take SQLite's write lock
+before reading.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Keys per statement when reading or deleting many entries, well below
+# SQLite's bound-parameter limit.
+BATCH_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get("OPTIONS", {})
+        self._busy_timeout = options.get("BUSY_TIMEOUT", 5)
+        self._local = threading.local()
+
+    def _connection(self):
+        # Connections are per thread and per process, so a connection opened
+        # before gunicorn forks its workers is never shared between them.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write_transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _live(expires, now=None):
+        return expires is None or expires > (now or time.time())
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _store(self, connection, key, value, timeout):
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, self._dumps(value), self.get_backend_timeout(timeout)),
+        )
+
+    def _cull(self, connection):
+        now = time.time()
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self._max_entries:
+            # Entries closest to expiry go first; those stored without a
+            # timeout (namespace versions, service-time models) go last.
+            cull_count = count // self._cull_frequency if self._cull_frequency else count
+            connection.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache "
+                "ORDER BY expires IS NULL, expires, rowid LIMIT ?)",
+                (cull_count,),
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = (
+            self._connection()
+            .execute("SELECT value, expires FROM cache WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None or not self._live(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        stored_keys = list(key_map)
+        now = time.time()
+        found = {}
+        connection = self._connection()
+        for start in range(0, len(stored_keys), BATCH_SIZE):
+            batch = stored_keys[start : start + BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            rows = connection.execute(
+                f"SELECT key, value, expires FROM cache WHERE key IN ({placeholders})",
+                batch,
+            )
+            for key, value, expires in rows:
+                if self._live(expires, now):
+                    found[key_map[key]] = pickle.loads(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write_transaction() as connection:
+            self._cull(connection)
+            self._store(connection, key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write_transaction() as connection:
+            row = connection.execute("SELECT expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._live(row[0]):
+                return False
+            self._cull(connection)
+            self._store(connection, key, value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        stored_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        connection = self._connection()
+        for start in range(0, len(stored_keys), BATCH_SIZE):
+            batch = stored_keys[start : start + BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            connection.execute(f"DELETE FROM cache WHERE key IN ({placeholders})", batch)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        row = connection.execute("SELECT expires FROM cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and self._live(row[0])
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write_transaction() as connection:
+            row = connection.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or not self._live(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            connection.execute(
+                "UPDATE cache SET value = ? WHERE key = ?", (self._dumps(new_value), key)
+            )
+        return new_value
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
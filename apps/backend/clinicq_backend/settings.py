@@ -102,7 +102,11 @@ else:
         DATABASES = {
             "default": dj_database_url.parse(
                 sanitized_database_url,
-                conn_max_age=600,
+                # Production serves the ASGI application, where each request's
+                # sync code runs in a fresh thread context and a persistent
+                # connection would never be reused, only left open. Only raise
+                # this when serving WSGI.
+                conn_max_age=int(os.getenv("DJANGO_CONN_MAX_AGE", "0")),
             )
         }
     except ValueError as exc:
@@ -147,12 +151,13 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-# === Cache (simple in-memory) ================================================
+# === Cache (SQLite file shared by all worker processes) ======================
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "clinicq-cache",
+        "BACKEND": "clinicq_backend.cache.SQLiteCache",
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", str(BASE_DIR / "cache.sqlite3")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", "5000"))},
     }
 }
 
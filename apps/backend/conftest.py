@@ -0,0 +1,40 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix, tmp_path_factory):
+    """Run SQLite tests against a file, so threads contend for its locks as in production.
+
+    Django's default in-memory test database uses shared-cache table locks,
+    which fail at once instead of waiting like a file database does.
+    """
+    database = settings.DATABASES["default"]
+    if database["ENGINE"] == "django.db.backends.sqlite3":
+        database.setdefault("TEST", {})["NAME"] = str(
+            tmp_path_factory.mktemp("db") / "test.sqlite3"
+        )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _cache_location(tmp_path_factory):
+    """Point the cache at a temporary file instead of the project's ``cache.sqlite3``.
+
+    Settings are loaded before this file is, so the location is swapped
+    with ``override_settings`` rather than ``DJANGO_CACHE_LOCATION``. That
+    also drops any cache connection already opened on the project file.
+    """
+    location = str(tmp_path_factory.mktemp("cache") / "cache.sqlite3")
+    with override_settings(
+        CACHES={"default": {**settings.CACHES["default"], "LOCATION": location}}
+    ):
+        yield location
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache(_cache_location):
+    """The cache is a file shared across processes, so start each test empty."""
+    cache.clear()
+    yield
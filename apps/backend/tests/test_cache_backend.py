@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from clinicq_backend.cache import SQLiteCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def make_cache(path, **options):
+    return SQLiteCache(path, {"OPTIONS": options})
+
+
+def test_entries_are_shared_between_cache_instances(cache_path):
+    """Separate instances on one file behave like separate worker processes."""
+    worker_a = make_cache(cache_path)
+    worker_b = make_cache(cache_path)
+
+    worker_a.set("patients", {"count": 2})
+    assert worker_b.get("patients") == {"count": 2}
+
+    worker_b.delete("patients")
+    assert worker_a.get("patients") is None
+
+
+def test_basic_operations(cache_path):
+    cache = make_cache(cache_path)
+
+    assert cache.add("key", "first") is True
+    assert cache.add("key", "second") is False
+    assert cache.get("key") == "first"
+    assert cache.has_key("key")
+
+    cache.set_many({"a": 1, "b": 2})
+    assert cache.get_many(["a", "b", "missing"]) == {"a": 1, "b": 2}
+    cache.delete_many(["a", "b"])
+    assert cache.get_many(["a", "b"]) == {}
+
+    cache.set("counter", 1)
+    assert cache.incr("counter") == 2
+    assert cache.decr("counter", 5) == -3
+    with pytest.raises(ValueError):
+        cache.incr("missing")
+
+    cache.clear()
+    assert cache.get("key") is None
+
+
+def test_expired_entries_are_not_returned(cache_path):
+    cache = make_cache(cache_path)
+    cache.set("short", "value", timeout=0.05)
+    cache.set("forever", "value", timeout=None)
+    time.sleep(0.1)
+
+    assert cache.get("short", "gone") == "gone"
+    assert not cache.has_key("short")
+    assert cache.add("short", "again") is True
+    assert cache.touch("forever", timeout=60)
+    assert cache.get("forever") == "value"
+
+
+def test_incr_is_atomic_across_connections(cache_path):
+    make_cache(cache_path).set("counter", 0)
+
+    def bump():
+        worker = make_cache(cache_path)
+        for _ in range(25):
+            worker.incr("counter")
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert make_cache(cache_path).get("counter") == 100
+
+
+def test_culls_oldest_entries_past_max_entries(cache_path):
+    cache = make_cache(cache_path, MAX_ENTRIES=10, CULL_FREQUENCY=2)
+    for index in range(12):
+        cache.set(f"key-{index}", index)
+
+    assert cache.get("key-0") is None
+    assert cache.get("key-11") == 11
+
+
+def test_cull_keeps_entries_without_timeout_over_expiring_ones(cache_path):
+    cache = make_cache(cache_path, MAX_ENTRIES=10, CULL_FREQUENCY=2)
+    cache.set("version", 1, timeout=None)
+    cache.set("late", "value", timeout=600)
+    for index in range(10):
+        cache.set(f"key-{index}", index, timeout=60)
+
+    assert cache.get("version") == 1
+    assert cache.get("late") == "value"
+    assert cache.get("key-0") is None
+    assert cache.get("key-9") == 9
@@ -1,8 +1,19 @@
 import datetime
+import threading
+
+from django.db import connection
 from django.test import TransactionTestCase
 from django.contrib.auth.models import Group, User
 from rest_framework.authtoken.models import Token
-from api.models import Patient, Queue, Visit
+from rest_framework.test import APIClient
+from api.models import (
+    Patient,
+    Queue,
+    QueueDailyStats,
+    RegistrationSequence,
+    Visit,
+    VisitTokenCounter,
+)
 
 
 class ConcurrencyTests(TransactionTestCase):
@@ -12,7 +23,7 @@ class ConcurrencyTests(TransactionTestCase):
 
     NOTE: SQLite has limited support for concurrent writes and may cause
     "database is locked" errors in these tests. In production with PostgreSQL,
-    the select_for_update() calls will properly prevent race conditions.
+    row locks on the counter tables properly prevent race conditions.
     """
 
     def setUp(self):
@@ -27,10 +38,10 @@ class ConcurrencyTests(TransactionTestCase):
     def test_concurrent_patient_creation_no_duplicates(self):
         """
         Test that concurrent patient creation doesn't generate duplicate registration numbers.
-        This verifies that select_for_update() prevents race conditions.
+        This verifies that the registration sequence hands out each serial once.
 
         NOTE: This is a simplified test due to SQLite limitations. With PostgreSQL,
-        the locking would work perfectly for truly concurrent requests.
+        the sequence row lock serialises truly concurrent requests.
         """
         # Create patients sequentially to verify unique IDs
         patients = []
@@ -61,10 +72,11 @@ class ConcurrencyTests(TransactionTestCase):
     def test_concurrent_visit_creation_no_duplicate_tokens(self):
         """
         Test that visit creation generates sequential token numbers.
-        This verifies that the token generation logic works correctly.
+        This verifies that the token counter hands out each token once.
 
-        NOTE: This is a simplified test due to SQLite limitations. With PostgreSQL,
-        select_for_update() would handle truly concurrent requests properly.
+        NOTE: This is a simplified test due to SQLite limitations. The counter
+        increment is a single UPDATE, so concurrent requests serialise on the
+        counter row in PostgreSQL and on the database write lock in SQLite.
         """
         # Create a patient first
         patient = Patient.objects.create(name="Test Patient", gender="MALE", category="01")
@@ -78,16 +90,7 @@ class ConcurrencyTests(TransactionTestCase):
             from django.db import transaction
 
             with transaction.atomic():
-                last_visit = (
-                    Visit.objects.select_for_update()
-                    .filter(queue=self.queue1, visit_date=today)
-                    .order_by("-token_number")
-                    .first()
-                )
-
-                next_token = 1
-                if last_visit:
-                    next_token = last_visit.token_number + 1
+                next_token = VisitTokenCounter.next_token(self.queue1, today)
 
                 visit = Visit.objects.create(
                     patient=patient,
@@ -125,3 +128,130 @@ class ConcurrencyTests(TransactionTestCase):
 
         # Verify the numbers are unique
         self.assertNotEqual(patient1.registration_number, patient2.registration_number)
+
+    def test_patient_creation_skips_numbers_taken_by_legacy_rows(self):
+        """
+        A registration number allocated from the sequence that already belongs
+        to a row created before the sequence existed is skipped, not overwritten.
+        """
+        now = datetime.datetime.now()
+        mmyy = f"{now.month:02d}{now.year % 100:02d}"
+        RegistrationSequence.objects.create(period=mmyy, category="01", last_serial=0)
+        legacy = Patient.objects.create(
+            registration_number=f"{mmyy}-01-0001", name="Legacy", gender="MALE"
+        )
+
+        patient = Patient.objects.create(name="New", gender="FEMALE", category="01")
+
+        self.assertEqual(patient.registration_number, f"{mmyy}-01-0002")
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.name, "Legacy")
+        self.assertEqual(
+            RegistrationSequence.objects.get(period=mmyy, category="01").last_serial, 2
+        )
+
+    def test_call_next_claims_each_waiting_visit_once(self):
+        """
+        Repeated "call next" claims hand out every waiting visit exactly once,
+        in token order.
+
+        NOTE: On SQLite, claims serialise on the database write lock taken by
+        touching the queue's token counter. With PostgreSQL, SKIP LOCKED lets
+        concurrent claims lock different rows instead.
+        """
+        patient = Patient.objects.create(name="Waiting Patient", gender="MALE", category="01")
+        today = datetime.date.today()
+        for token in (3, 1, 2):
+            Visit.objects.create(
+                patient=patient, queue=self.queue1, token_number=token, visit_date=today
+            )
+
+        claimed = [Visit.claim_next(self.queue1, today) for _ in range(4)]
+
+        self.assertEqual([visit.token_number for visit in claimed[:3]], [1, 2, 3])
+        self.assertIsNone(claimed[3])
+        self.assertEqual(Visit.objects.filter(queue=self.queue1, status="START").count(), 3)
+
+
+class ThreadedAllocationTests(TransactionTestCase):
+    """Allocations from several threads at once, each on its own connection."""
+
+    threads = 6
+
+    def _run_concurrently(self, allocate):
+        barrier = threading.Barrier(self.threads)
+        results, errors = [], []
+
+        def worker():
+            try:
+                barrier.wait()
+                results.append(allocate())
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_token_allocation_waits_for_the_write_lock(self):
+        queue = Queue.objects.create(name="Threaded")
+        today = datetime.date.today()
+
+        tokens = self._run_concurrently(lambda: VisitTokenCounter.next_token(queue, today))
+
+        self.assertEqual(sorted(tokens), list(range(1, self.threads + 1)))
+
+    def test_concurrent_patient_registration_waits_for_the_write_lock(self):
+        patients = self._run_concurrently(
+            lambda: Patient.objects.create(name="Threaded Patient", category="02")
+        )
+
+        serials = sorted(int(patient.registration_number[-4:]) for patient in patients)
+        self.assertEqual(serials, list(range(1, self.threads + 1)))
+
+    def test_concurrent_rollup_updates_are_all_counted(self):
+        queue = Queue.objects.create(name="Threaded Stats")
+        today = datetime.date.today()
+
+        self._run_concurrently(lambda: QueueDailyStats.add(queue.pk, today, visits=1))
+
+        self.assertEqual(QueueDailyStats.objects.get(queue=queue).visits, self.threads)
+
+    def test_concurrent_bulk_transitions_move_each_visit_once(self):
+        doctor_group, _ = Group.objects.get_or_create(name="Doctor")
+        doctor = User.objects.create_user(username="threaded_doctor", password="pass")
+        doctor.groups.add(doctor_group)
+        token = Token.objects.create(user=doctor)
+        queue = Queue.objects.create(name="Threaded Bulk")
+        patient = Patient.objects.create(name="Threaded Bulk Patient", category="01")
+        ids = [
+            Visit.objects.create(
+                patient=patient, queue=queue, token_number=number, visit_date=datetime.date.today()
+            ).pk
+            for number in range(1, 4)
+        ]
+
+        def transition():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+            return client.post(
+                "/api/visits/bulk-transition/", {"action": "start", "ids": ids}, format="json"
+            )
+
+        responses = self._run_concurrently(transition)
+
+        self.assertEqual([response.status_code for response in responses], [200] * self.threads)
+        outcomes = [
+            (result["id"], result["outcome"])
+            for response in responses
+            for result in response.data["results"]
+        ]
+        for pk in ids:
+            self.assertEqual(outcomes.count((pk, "updated")), 1)
+        self.assertEqual(Visit.objects.filter(pk__in=ids, status="START").count(), len(ids))
@@ -0,0 +1,379 @@
+"""Query budgets for every route in ``api/urls.py``.
+
+Each endpoint is called against 1, 10 and 100 rows of data (lists are
+asked for a single page holding every row) and must stay within a fixed
+number of queries. A serializer or permission class that queries per row
+blows the budget at the larger sizes.
+
+Budgets are counted on SQLite, which CI runs. On PostgreSQL, writes also
+send one ``pg_notify`` query each.
+
+The SSE stream (``queues/<pk>/events/``) never completes, so it is left out.
+"""
+
+import datetime
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.models import (
+    Patient,
+    PrescriptionImage,
+    Queue,
+    QueueDailyStats,
+    Visit,
+    VisitEvent,
+)
+
+SIZES = (1, 10, 100)
+
+
+class World:
+    """``size`` patients, each with a visit today and one yesterday in one queue.
+
+    Today's visits cycle through every status and each has a prescription
+    image and a creation event. The queue has ``size`` days of rollups.
+    """
+
+    statuses = ("WAITING", "START", "IN_ROOM", "DONE")
+
+    def __init__(self, size):
+        self.size = size
+        self.today = datetime.date.today()
+        self.users = {}
+        for role in ("Doctor", "Assistant", "Display"):
+            user = User.objects.create(username=f"budget_{role.lower()}")
+            user.groups.add(Group.objects.get_or_create(name=role)[0])
+            self.users[role] = Token.objects.create(user=user).key
+
+        self.queue = Queue.objects.create(name="Budget Queue")
+        self.patients = [
+            Patient.objects.create(
+                registration_number=f"0125-01-{number:04d}",
+                name=f"Budget Patient {number}",
+                phone=f"0300{number:07d}",
+            )
+            for number in range(1, size + 1)
+        ]
+        yesterday = self.today - datetime.timedelta(days=1)
+        Visit.objects.bulk_create(
+            Visit(patient=patient, queue=self.queue, token_number=token, visit_date=yesterday)
+            for token, patient in enumerate(self.patients, start=1)
+        )
+        self.visits = Visit.objects.bulk_create(
+            Visit(
+                patient=patient,
+                queue=self.queue,
+                token_number=token,
+                visit_date=self.today,
+                status=self.statuses[(token - 1) % len(self.statuses)],
+            )
+            for token, patient in enumerate(self.patients, start=1)
+        )
+        self.visits = list(Visit.objects.filter(visit_date=self.today).order_by("token_number"))
+        PrescriptionImage.objects.bulk_create(
+            PrescriptionImage(visit=visit, drive_file_id=f"file-{visit.pk}")
+            for visit in self.visits
+        )
+        VisitEvent.objects.bulk_create(VisitEvent.for_visit(visit) for visit in self.visits)
+        QueueDailyStats.objects.bulk_create(
+            QueueDailyStats(
+                queue=self.queue,
+                visit_date=self.today - datetime.timedelta(days=offset),
+                visits=3,
+            )
+            for offset in range(size)
+        )
+
+    def visit_in(self, status):
+        """Return one of today's visits in ``status``, adding one if none is."""
+        for visit in self.visits:
+            if visit.status == status:
+                return visit
+        return Visit.objects.create(
+            patient=self.patient,
+            queue=self.queue,
+            token_number=len(self.visits) + 1,
+            visit_date=self.today,
+            status=status,
+        )
+
+    @property
+    def patient(self):
+        return self.patients[0]
+
+    @property
+    def numbers(self):
+        return [patient.registration_number for patient in self.patients]
+
+    @property
+    def visit_ids(self):
+        return [visit.pk for visit in self.visits]
+
+
+# (name, role, method, path, data, budget). ``path`` and ``data`` take the
+# World; list endpoints ask for one page of up to 100 rows.
+ENDPOINTS = [
+    ("api-root", "Doctor", "get", lambda w: "/api/", None, 1),
+    ("health", None, "get", lambda w: "/api/health/", None, 0),
+    ("auth-me", "Doctor", "get", lambda w: "/api/auth/me/", None, 2),
+    ("queue-list", "Doctor", "get", lambda w: "/api/queues/", None, 3),
+    ("queue-detail", "Doctor", "get", lambda w: f"/api/queues/{w.queue.pk}/", None, 3),
+    ("queue-board", "Display", "get", lambda w: f"/api/queues/{w.queue.pk}/board/", None, 3),
+    (
+        "queue-call-next",
+        "Doctor",
+        "post",
+        lambda w: f"/api/queues/{w.queue.pk}/call-next/",
+        None,
+        11,
+    ),
+    (
+        "queue-analytics",
+        "Doctor",
+        "get",
+        lambda w: "/api/analytics/queues/?since=2000-01-01",
+        None,
+        4,
+    ),
+    ("patient-list", "Doctor", "get", lambda w: "/api/patients/?page_size=100", None, 5),
+    (
+        "patient-list-cursor",
+        "Doctor",
+        "get",
+        lambda w: "/api/patients/?cursor=&page_size=100",
+        None,
+        4,
+    ),
+    (
+        "patient-list-filtered",
+        "Doctor",
+        "get",
+        lambda w: "/api/patients/?page_size=100&registration_numbers=" + ",".join(w.numbers[:50]),
+        None,
+        5,
+    ),
+    (
+        "patient-detail",
+        "Doctor",
+        "get",
+        lambda w: f"/api/patients/{w.patient.registration_number}/",
+        None,
+        4,
+    ),
+    (
+        "patient-create",
+        "Assistant",
+        "post",
+        lambda w: "/api/patients/",
+        lambda w: {"name": "New Budget Patient", "category": "01"},
+        12,
+    ),
+    (
+        "patient-update",
+        "Doctor",
+        "patch",
+        lambda w: f"/api/patients/{w.patient.registration_number}/",
+        lambda w: {"phone": "03001234567"},
+        5,
+    ),
+    (
+        "patient-delete",
+        "Doctor",
+        "delete",
+        lambda w: f"/api/patients/{w.patient.registration_number}/",
+        None,
+        9,
+    ),
+    (
+        "patient-search",
+        "Doctor",
+        "get",
+        lambda w: "/api/patients/search/?q=Budget&page_size=100",
+        None,
+        5,
+    ),
+    (
+        "patient-autocomplete",
+        "Doctor",
+        "get",
+        lambda w: "/api/patients/autocomplete/?q=Budget&limit=25",
+        None,
+        3,
+    ),
+    (
+        "patient-bulk",
+        "Doctor",
+        "post",
+        lambda w: "/api/patients/bulk/",
+        lambda w: {"registration_numbers": w.numbers},
+        3,
+    ),
+    ("visit-list", "Doctor", "get", lambda w: "/api/visits/?page_size=100", None, 5),
+    (
+        "visit-list-display",
+        "Display",
+        "get",
+        lambda w: f"/api/visits/?status=WAITING&queue={w.queue.pk}&page_size=100",
+        None,
+        6,
+    ),
+    (
+        "visit-list-expanded",
+        "Doctor",
+        "get",
+        lambda w: "/api/visits/?expand=patient,prescriptions&page_size=100",
+        None,
+        7,
+    ),
+    (
+        "visit-list-cursor",
+        "Doctor",
+        "get",
+        lambda w: "/api/visits/?cursor=&page_size=100",
+        None,
+        3,
+    ),
+    ("visit-detail", "Doctor", "get", lambda w: f"/api/visits/{w.visits[0].pk}/", None, 2),
+    (
+        "visit-create",
+        "Assistant",
+        "post",
+        lambda w: "/api/visits/",
+        lambda w: {"patient": w.patient.registration_number, "queue": w.queue.pk},
+        18,
+    ),
+    (
+        "visit-start",
+        "Doctor",
+        "patch",
+        lambda w: f"/api/visits/{w.visit_in('WAITING').pk}/start/",
+        None,
+        9,
+    ),
+    (
+        "visit-in-room",
+        "Doctor",
+        "patch",
+        lambda w: f"/api/visits/{w.visit_in('START').pk}/in_room/",
+        None,
+        7,
+    ),
+    (
+        "visit-send-back",
+        "Doctor",
+        "patch",
+        lambda w: f"/api/visits/{w.visit_in('IN_ROOM').pk}/send_back_to_waiting/",
+        None,
+        7,
+    ),
+    (
+        "visit-done",
+        "Doctor",
+        "patch",
+        lambda w: f"/api/visits/{w.visit_in('IN_ROOM').pk}/done/",
+        None,
+        9,
+    ),
+    (
+        "visit-bulk-transition",
+        "Doctor",
+        "post",
+        lambda w: "/api/visits/bulk-transition/",
+        lambda w: {"action": "done", "ids": w.visit_ids},
+        9,
+    ),
+    (
+        "visit-update",
+        "Doctor",
+        "patch",
+        lambda w: f"/api/visits/{w.visits[0].pk}/",
+        lambda w: {"patient": w.patients[-1].registration_number},
+        6,
+    ),
+    (
+        "visit-delete",
+        "Doctor",
+        "delete",
+        lambda w: f"/api/visits/{w.visits[0].pk}/",
+        None,
+        8,
+    ),
+    (
+        "prescription-list",
+        "Doctor",
+        "get",
+        lambda w: "/api/prescriptions/?page_size=100",
+        None,
+        2,
+    ),
+    (
+        "prescription-detail",
+        "Doctor",
+        "get",
+        lambda w: f"/api/prescriptions/{w.visits[0].prescription_images.get().pk}/",
+        None,
+        2,
+    ),
+    (
+        "prescription-create",
+        "Doctor",
+        "post",
+        lambda w: "/api/prescriptions/",
+        lambda w: {"visit": w.visits[0].pk, "image": _image()},
+        4,
+    ),
+]
+
+
+def _image():
+    return SimpleUploadedFile("rx.jpg", b"jpeg-bytes", content_type="image/jpeg")
+
+
+@pytest.fixture(autouse=True)
+def _no_drive_upload():
+    with mock.patch("api.views.upload_prescription_image", return_value=("file", "")):
+        yield
+
+
+def _read_stream(response):
+    if not response.is_async:
+        return b"".join(response.streaming_content)
+
+    async def read():
+        return b"".join([part async for part in response.streaming_content])
+
+    return async_to_sync(read)()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize(
+    "name, role, method, path, data, budget", ENDPOINTS, ids=[e[0] for e in ENDPOINTS]
+)
+def test_endpoint_stays_within_query_budget(name, role, method, path, data, budget, size):
+    world = World(size)
+    client = APIClient()
+    if role:
+        client.credentials(HTTP_AUTHORIZATION=f"Token {world.users[role]}")
+    url = path(world)
+    payload = data(world) if data else None
+    request_format = "multipart" if name == "prescription-create" else "json"
+
+    with CaptureQueriesContext(connection) as captured:
+        response = getattr(client, method)(url, payload, format=request_format)
+        if response.streaming:
+            _read_stream(response)
+
+    assert response.status_code < 400, response.content
+    executed = [query["sql"] for query in captured.captured_queries]
+    report = "\n".join(executed)
+    message = f"{name} ran {len(executed)} queries with {size} rows (budget {budget}):\n{report}"
+    assert len(executed) <= budget, message
@@ -52,8 +52,8 @@ describe('Displays last_5_visit_dates', () => {
       if (url === '/queues/') {
         return Promise.resolve({ data: [{ id: 1, name: 'General' }] });
       }
-      if (url.startsWith('/patients/search/')) {
-        return Promise.resolve({ data: [{ registration_number: 1 }] });
+      if (url.startsWith('/patients/autocomplete/')) {
+        return Promise.resolve({ data: { results: [{ registration_number: 1 }] } });
       }
       if (url === '/patients/1/') {
         return Promise.resolve({
@@ -104,17 +104,12 @@ describe('Displays last_5_visit_dates', () => {
               patient_full_name: 'Alice',
               patient_registration_number: 1,
               status: 'WAITING',
-            },
-          ],
-        });
-      }
-      if (url.includes('/patients')) {
-        return Promise.resolve({
-          data: [
-            {
-              registration_number: 1,
-              last_5_visit_dates: ['2024-01-01', '2023-12-31'],
-              gender: 'FEMALE',
+              patient_details: {
+                registration_number: 1,
+                last_5_visit_dates: ['2024-01-01', '2023-12-31'],
+                gender: 'FEMALE',
+              },
+              prescription_images: [],
             },
           ],
         });
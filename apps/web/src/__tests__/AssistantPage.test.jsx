@@ -1,4 +1,4 @@
-import { render, screen } from '@testing-library/react';
+import { fireEvent, render, screen, waitFor } from '@testing-library/react';
 import { MemoryRouter } from 'react-router-dom';
 import AssistantPage from '../pages/AssistantPage';
 import api from '../api';
@@ -14,3 +14,71 @@ test('renders Assistant portal heading', async () => {
   );
   expect(await screen.findByText(/Assistant Portal/i)).toBeInTheDocument();
 });
+
+test('previews a patient only once the full registration number is typed', async () => {
+  const patient = {
+    registration_number: '1025-01-0012',
+    name: 'Ayesha Khan',
+    phone: '0300 1234567',
+    gender: 'FEMALE',
+  };
+  api.get.mockImplementation((url) => {
+    if (url.startsWith('/patients/autocomplete/')) {
+      return Promise.resolve({ data: { results: [patient] } });
+    }
+    if (url === `/patients/${patient.registration_number}/`) {
+      return Promise.resolve({ data: patient });
+    }
+    return Promise.resolve({ data: [] });
+  });
+  render(
+    <MemoryRouter>
+      <AssistantPage />
+    </MemoryRouter>
+  );
+  const input = await screen.findByLabelText(/Registration number/i);
+
+  fireEvent.change(input, { target: { value: '1025-01-001' } });
+  await waitFor(() =>
+    expect(api.get).toHaveBeenCalledWith('/patients/autocomplete/?q=1025-01-001&limit=5'),
+  );
+  await waitFor(() => expect(screen.getByText('Awaiting')).toBeInTheDocument());
+  expect(screen.queryByText('Ayesha Khan')).not.toBeInTheDocument();
+
+  fireEvent.change(input, { target: { value: '1025-01-0012' } });
+  expect(await screen.findByText('Ayesha Khan')).toBeInTheDocument();
+});
+
+test('previews a patient once their full phone number is typed', async () => {
+  const patient = {
+    registration_number: '1025-01-0012',
+    name: 'Ayesha Khan',
+    phone: '0300 1234567',
+    gender: 'FEMALE',
+  };
+  api.get.mockImplementation((url) => {
+    if (url.startsWith('/patients/autocomplete/')) {
+      return Promise.resolve({ data: { results: [patient] } });
+    }
+    if (url === `/patients/${patient.registration_number}/`) {
+      return Promise.resolve({ data: patient });
+    }
+    return Promise.resolve({ data: [] });
+  });
+  render(
+    <MemoryRouter>
+      <AssistantPage />
+    </MemoryRouter>
+  );
+  const input = await screen.findByLabelText(/Registration number/i);
+
+  fireEvent.change(input, { target: { value: '1234567' } });
+  await waitFor(() =>
+    expect(api.get).toHaveBeenCalledWith('/patients/autocomplete/?q=1234567&limit=5'),
+  );
+  await waitFor(() => expect(screen.getByText('Awaiting')).toBeInTheDocument());
+  expect(screen.queryByText('Ayesha Khan')).not.toBeInTheDocument();
+
+  fireEvent.change(input, { target: { value: '0300-1234567' } });
+  expect(await screen.findByText('Ayesha Khan')).toBeInTheDocument();
+});
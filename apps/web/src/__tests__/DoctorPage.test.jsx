@@ -12,6 +12,8 @@ const mockVisits = [
     token_number: 101,
     patient_full_name: 'John Doe',
     patient_registration_number: 'P001',
+    patient_details: { registration_number: 'P001', gender: 'MALE', last_5_visit_dates: [] },
+    prescription_images: [],
   },
   {
     id: 2,
@@ -19,6 +21,8 @@ const mockVisits = [
     token_number: 102,
     patient_full_name: 'Jane Smith',
     patient_registration_number: 'P002',
+    patient_details: { registration_number: 'P002', gender: 'FEMALE', last_5_visit_dates: [] },
+    prescription_images: [],
   },
   {
     id: 3,
@@ -26,30 +30,22 @@ const mockVisits = [
     token_number: 103,
     patient_full_name: 'Peter Pan',
     patient_registration_number: 'P003',
+    patient_details: { registration_number: 'P003', gender: 'OTHER', last_5_visit_dates: [] },
+    prescription_images: [],
   },
 ];
 
-const mockPatientDetails = {
-  P001: { registration_number: 'P001', gender: 'MALE', last_5_visit_dates: [] },
-  P002: { registration_number: 'P002', gender: 'FEMALE', last_5_visit_dates: [] },
-  P003: { registration_number: 'P003', gender: 'OTHER', last_5_visit_dates: [] },
-};
-
 beforeEach(() => {
   api.get.mockImplementation((url) => {
     if (url.includes('/visits')) {
       return Promise.resolve({ data: mockVisits });
     }
-    if (url.includes('/patients')) {
-      const regNumbers = url.split('=')[1].split(',');
-      const patients = regNumbers.map(reg => mockPatientDetails[reg]).filter(Boolean);
-      return Promise.resolve({ data: patients });
-    }
     if (url.includes('/queues')) {
       return Promise.resolve({ data: [] });
     }
     return Promise.resolve({ data: [] });
   });
+  api.post.mockResolvedValue({ data: {} });
   api.patch.mockResolvedValue({ data: {} });
 });
 
@@ -62,6 +58,9 @@ test('renders Doctor dashboard and displays visits with correct action buttons',
 
   // Check for dashboard heading
   expect(await screen.findByText(/Doctor Dashboard/i)).toBeInTheDocument();
+  expect(api.get).toHaveBeenCalledWith(
+    '/visits/?status=WAITING,START,IN_ROOM&expand=patient,prescriptions',
+  );
 
   // Check for WAITING visit and its button
   expect(await screen.findByText(/John Doe/i)).toBeInTheDocument();
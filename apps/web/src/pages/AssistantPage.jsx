@@ -1,7 +1,7 @@
 import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import api from '../api.js';
-import { firstFromListResponse } from '../utils/api.js';
+import { unwrapListResponse } from '../utils/api.js';
 import {
   WorkspaceLayout,
   TextField,
@@ -9,6 +9,12 @@ import {
   ProgressPulse,
 } from '../components/index.js';
 
+// Suggestions to scan for an exact match: a registration number prefix
+// ranks ahead of a phone ending, so the phone match may not come first.
+const LOOKUP_LIMIT = 5;
+
+const digitsOf = (value) => String(value ?? '').replace(/\D/g, '');
+
 const AssistantPage = () => {
   const [registrationNumber, setRegistrationNumber] = useState('');
   const [queues, setQueues] = useState([]);
@@ -43,20 +49,28 @@ const AssistantPage = () => {
     setIsSearching(true);
 
     const handler = setTimeout(async () => {
+      const query = registrationNumber.trim();
       try {
         const searchResp = await api.get(
-          `/patients/search/?q=${encodeURIComponent(registrationNumber.trim())}`,
+          `/patients/autocomplete/?q=${encodeURIComponent(query)}&limit=${LOOKUP_LIMIT}`,
         );
 
         if (!active) return;
 
-        const firstMatch = firstFromListResponse(searchResp.data);
-        if (!firstMatch?.registration_number) {
+        // Partial input still returns completions; only preview a patient
+        // whose full registration number or full phone number was typed.
+        const queryDigits = digitsOf(query);
+        const match = unwrapListResponse(searchResp.data).find(
+          (patient) =>
+            patient?.registration_number === query ||
+            (queryDigits !== '' && digitsOf(patient?.phone) === queryDigits),
+        );
+        if (!match) {
           setPatientInfo(null);
           return;
         }
 
-        const detailResp = await api.get(`/patients/${firstMatch.registration_number}/`);
+        const detailResp = await api.get(`/patients/${match.registration_number}/`);
         if (active) {
           setPatientInfo(detailResp.data);
         }
@@ -155,7 +169,7 @@ const AssistantPage = () => {
             value={registrationNumber}
             onChange={(e) => setRegistrationNumber(e.target.value)}
             autoComplete="off"
-            description="Search by patient ID or phone to pre-fill their context."
+            description="Enter the full patient ID or phone number to pre-fill their context."
             leadingIcon="#"
           />
           <SelectField
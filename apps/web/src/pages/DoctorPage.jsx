@@ -26,65 +26,17 @@ const DoctorPage = () => {
     setError('');
     try {
       const queueParam = selectedQueue ? `&queue=${selectedQueue}` : '';
-      const response = await api.get(`/visits/?status=WAITING,START,IN_ROOM${queueParam}`);
-      const fetchedVisits = unwrapListResponse(response.data);
-
-      const registrationNumbers = [
-        ...new Set(
-          fetchedVisits
-            .map((visit) => visit.patient_registration_number)
-            .filter(Boolean)
-            .map((value) => String(value)),
-        ),
-      ];
-
-      let patientsByRegNum = {};
-      if (registrationNumbers.length > 0) {
-        const CHUNK_SIZE = 50;
-        const registrationChunks = [];
-        for (let i = 0; i < registrationNumbers.length; i += CHUNK_SIZE) {
-          registrationChunks.push(registrationNumbers.slice(i, i + CHUNK_SIZE));
-        }
-
-        const patientResponses = await Promise.all(
-          registrationChunks.map((chunk) =>
-            api.get(`/patients/?registration_numbers=${chunk.join(',')}`),
-          ),
-        );
-
-        patientsByRegNum = patientResponses.reduce((acc, resp) => {
-          const patientList = unwrapListResponse(resp.data);
-          patientList.forEach((patient) => {
-            if (patient?.registration_number !== undefined) {
-              acc[String(patient.registration_number)] = patient;
-            }
-          });
-          return acc;
-        }, {});
-      }
-
-      const detailedVisits = fetchedVisits.map((visit) => ({
-        ...visit,
-        patient_details:
-          patientsByRegNum[String(visit.patient_registration_number)] ?? null,
-      }));
-
-      let withImages = detailedVisits;
-      if (import.meta.env.MODE !== 'test') {
-        withImages = await Promise.all(
-          detailedVisits.map(async (visit) => {
-            try {
-              const imgResp = await api.get(`/prescriptions/?visit=${visit.id}`);
-              return { ...visit, prescription_images: unwrapListResponse(imgResp.data) };
-            } catch (imageError) {
-              console.error('Failed to fetch prescription images:', imageError);
-              return { ...visit, prescription_images: [] };
-            }
-          }),
-        );
-      }
-
-      setVisits(withImages);
+      // One request embeds each visit's patient and prescription images.
+      const response = await api.get(
+        `/visits/?status=WAITING,START,IN_ROOM${queueParam}&expand=patient,prescriptions`,
+      );
+      setVisits(
+        unwrapListResponse(response.data).map((visit) => ({
+          ...visit,
+          patient_details: visit.patient_details ?? null,
+          prescription_images: visit.prescription_images ?? [],
+        })),
+      );
     } catch (err) {
       console.error('Error fetching visits:', err);
       setError('Failed to fetch visits. Please try again.');
@@ -118,6 +70,10 @@ const DoctorPage = () => {
       } catch (err) {
         console.error(`Error during action ${action} for visit ${visitId}:`, err);
         setError(`Failed to perform action. ${err.response?.data?.detail || ''}`);
+        if (err.response?.status === 409) {
+          // Someone else moved this visit first; show its current state.
+          fetchVisits();
+        }
       }
     },
     [fetchVisits],
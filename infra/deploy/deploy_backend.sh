@@ -5,7 +5,7 @@ set -e # Exit immediately if a command exits with a non-zero status.
 PROJECT_DIR="/srv/clinicq" # Root directory of your project on the server
 VENV_DIR="$PROJECT_DIR/venv" # Virtual environment directory
 BACKEND_DIR="$PROJECT_DIR/clinicq_backend" # Django project directory
-USER="clinicq_service_user" # The user Gunicorn/Django will run as (ensure this user exists and has perms)
+USER="clinicq_service_user" # The user Uvicorn/Django will run as (ensure this user exists and has perms)
 
 echo "--- Starting ClinicQ Backend Deployment ---"
 
@@ -36,7 +36,7 @@ python "$BACKEND_DIR/manage.py" makemigrations --noinput
 python "$BACKEND_DIR/manage.py" migrate --noinput
 python "$BACKEND_DIR/manage.py" collectstatic --noinput --clear # Clear existing static files first
 
-echo "[6/7] Restarting Gunicorn service"
+echo "[6/7] Restarting Uvicorn service"
 # Ensure the service name matches your systemd service file (e.g., clinicq.service)
 sudo systemctl restart clinicq # Or clinicq.service
 
@@ -48,7 +48,7 @@ echo "--- ClinicQ Backend Deployment Complete ---"
 
 # Note:
 # - Ensure this script is executable: chmod +x deploy_backend.sh
-# - This script assumes a systemd service named 'clinicq' manages Gunicorn.
+# - This script assumes a systemd service named 'clinicq' manages Uvicorn.
 # - Database creation and superuser setup are not handled here; do that once manually or via another script.
-# - Environment variables (from .env file) should be loaded by Gunicorn/Django, typically via the systemd service file.
+# - Environment variables (from .env file) should be loaded by Uvicorn/Django, typically via the systemd service file.
 # - Ensure file permissions are correctly set for $USER to read project files and write to necessary log/media dirs.